@@ -0,0 +1,662 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import asyncio
+import heapq
+import json
+import lzma
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# ---------------------------
+# Frequency-based admission
+# ---------------------------
+
+class TinyLFU:
+    """TinyLFU admission filter: a count-min sketch behind a doorkeeper bloom filter.
+
+    ``record`` is called on every lookup. The first sighting of a key only sets
+    its doorkeeper bits, so one-off keys never reach the sketch. ``admit``
+    lets a new key displace an eviction victim only if it has been seen more
+    often. Counters saturate at 15 and are halved (and the doorkeeper reset)
+    every ``sample_factor * capacity`` recordings, so old popularity fades.
+    """
+
+    DEPTH = 4
+    _HALVE = bytes(i >> 1 for i in range(256))
+    _SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+
+    def __init__(self, capacity: int, sample_factor: int = 10) -> None:
+        capacity = max(int(capacity), 16)
+        width = 1
+        while width < capacity:
+            width <<= 1
+        self._mask = width - 1
+        self._table = [bytearray(width) for _ in range(self.DEPTH)]
+        self.sample_size = capacity * sample_factor
+        # ~4 bits per key seen in a sample period keeps doorkeeper false positives low
+        self._door = bytearray(max(self.sample_size // 2, 64))
+        self._door_bits = len(self._door) * 8
+        self._additions = 0
+
+    def _indexes(self, h: int) -> Iterator[int]:
+        for seed in self._SEEDS:
+            yield ((h * seed) >> 17) & self._mask
+
+    def _door_positions(self, h: int) -> Tuple[int, int]:
+        return (h * 0x9E3779B1) % self._door_bits, (h * 0x85EBCA77 + 1) % self._door_bits
+
+    def _in_door(self, h: int) -> bool:
+        return all(self._door[p >> 3] & (1 << (p & 7)) for p in self._door_positions(h))
+
+    def record(self, key: Hashable) -> None:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        if not self._in_door(h):
+            for p in self._door_positions(h):
+                self._door[p >> 3] |= 1 << (p & 7)
+        else:
+            for row, idx in zip(self._table, self._indexes(h)):
+                if row[idx] < 15:
+                    row[idx] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: Hashable) -> int:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        count = min(row[idx] for row, idx in zip(self._table, self._indexes(h)))
+        return count + (1 if self._in_door(h) else 0)
+
+    def admit(self, candidate: Hashable, victim: Hashable) -> bool:
+        return self.estimate(candidate) > self.estimate(victim)
+
+    def _age(self) -> None:
+        for row in self._table:
+            row[:] = row.translate(self._HALVE)
+        self._door = bytearray(len(self._door))
+        self._additions //= 2
+
+
+# ---------------------------
+# In-memory response cache
+# ---------------------------
+
+class LRUCache:
+    """Bounded LRU cache with an entry-count and a byte budget.
+
+    Values are stored together with a caller-supplied size estimate (in bytes);
+    the least recently used entries are evicted whenever either budget is
+    exceeded. ``get`` and ``put`` are O(1) (amortised for evictions).
+    A budget of ``0`` means "unlimited" for that dimension.
+
+    Entries may be tagged with a ``group`` (e.g. an upstream path prefix);
+    entry counts, bytes and evictions are then also tracked per group so
+    ``stats`` stays O(number of groups).
+
+    With an ``admission`` filter (see ``TinyLFU``) every lookup is recorded,
+    and a new key that would force an eviction is only inserted if it is used
+    more often than the least recently used entry it would displace.
+
+    Entries put with a ``deadline`` are also indexed in a min-heap so
+    ``expire`` can reclaim dead entries in O(log n) each without scanning the
+    cache. Heap items for replaced or removed entries are skipped lazily.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        admission: Optional["TinyLFU"] = None,
+    ) -> None:
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.admission = admission
+        self.rejections = 0
+        self._data: "OrderedDict[Hashable, Tuple[Any, int, Optional[str], Optional[float]]]" = OrderedDict()
+        self._deadlines: List[Tuple[float, int, Hashable]] = []
+        self._seq = 0
+        self.expirations = 0
+        self._groups: Dict[str, Dict[str, int]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.admission is not None:
+            self.admission.record(key)
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def record_miss(self, key: Hashable) -> None:
+        """Count a lookup for ``key`` that the caller resolved as a miss without ``get``."""
+        if self.admission is not None:
+            self.admission.record(key)
+        self.misses += 1
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return the value for ``key`` without touching recency or counters."""
+        item = self._data.get(key)
+        return item[0] if item is not None else None
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        size: int = 0,
+        group: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> bool:
+        """Insert or replace ``key``. Returns False if the value can never fit or is not admitted.
+
+        ``deadline`` is the time (on the caller's clock) after which ``expire``
+        may drop the entry.
+        """
+        size = max(int(size), 0)
+        if self.max_bytes and size > self.max_bytes:
+            # never cache something that would flush the whole cache
+            self.pop(key)
+            return False
+        if key not in self._data and self.admission is not None and self._would_evict(size):
+            victim = next(iter(self._data))
+            if not self.admission.admit(key, victim):
+                self.rejections += 1
+                return False
+        self.pop(key)
+        self._data[key] = (value, size, group, deadline)
+        self._account(group, 1, size)
+        if deadline is not None:
+            self._seq += 1
+            heapq.heappush(self._deadlines, (deadline, self._seq, key))
+            if len(self._deadlines) > 2 * len(self._data) + 1024:
+                self._rebuild_deadlines()
+        self._evict()
+        return True
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self._account(item[2], -1, -item[1])
+        return item[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._groups.clear()
+        self._deadlines.clear()
+        self.bytes = 0
+
+    def expire(self, now: float, limit: int = 0) -> int:
+        """Drop entries whose deadline is <= ``now`` (at most ``limit`` if > 0)."""
+        removed = 0
+        heap = self._deadlines
+        while heap and heap[0][0] <= now and (not limit or removed < limit):
+            deadline, _seq, key = heapq.heappop(heap)
+            item = self._data.get(key)
+            if item is None or item[3] != deadline:
+                continue  # replaced or already gone
+            self.pop(key)
+            self.expirations += 1
+            removed += 1
+        return removed
+
+    def _rebuild_deadlines(self) -> None:
+        self._deadlines = [
+            (item[3], i, key) for i, (key, item) in enumerate(self._data.items()) if item[3] is not None
+        ]
+        heapq.heapify(self._deadlines)
+        self._seq = len(self._data)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        for key, item in self._data.items():
+            yield key, item[0]
+
+    def _would_evict(self, size: int) -> bool:
+        if not self._data:
+            return False
+        return bool(
+            (self.max_entries and len(self._data) + 1 > self.max_entries)
+            or (self.max_bytes and self.bytes + size > self.max_bytes)
+        )
+
+    def _account(self, group: Optional[str], entries: int, size: int) -> None:
+        self.bytes += size
+        if group is not None:
+            stats = self._groups.setdefault(group, {"entries": 0, "bytes": 0, "evictions": 0})
+            stats["entries"] += entries
+            stats["bytes"] += size
+
+    def _evict(self) -> None:
+        while self._data and (
+            (self.max_entries and len(self._data) > self.max_entries)
+            or (self.max_bytes and self.bytes > self.max_bytes)
+        ):
+            _key, (_value, size, group, _deadline) = self._data.popitem(last=False)
+            self._account(group, -1, -size)
+            self.evictions += 1
+            if group is not None:
+                self._groups[group]["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rejections": self.rejections,
+            "expirations": self.expirations,
+        }
+
+    def group_stats(self) -> Dict[str, Dict[str, int]]:
+        return {group: dict(stats) for group, stats in self._groups.items()}
+
+
+# ---------------------------
+# Request coalescing
+# ---------------------------
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key.
+
+    The first caller for a key starts the coroutine as a task; callers arriving
+    while it is still in flight await the same task and receive the same
+    result or exception. A cancelled caller does not cancel the shared call.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> "asyncio.Task[Any]":
+        """Return the in-flight task for ``key``, starting ``fn`` if there is none."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return task
+
+    def _finish(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved; waiters re-raise it themselves
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, fn))
+
+
+# ---------------------------
+# Micro-batching
+# ---------------------------
+
+class MicroBatcher:
+    """Collect items submitted close together and resolve them with one call.
+
+    Items are grouped by ``group`` (e.g. the query parameters of a lookup).
+    A group is flushed ``window`` seconds after its first item arrives or as
+    soon as it holds ``max_size`` items, whichever comes first; ``fn(group,
+    items)`` then returns a mapping from item to result, and each waiting
+    caller receives its own entry (None if absent) or the call's exception.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[Hashable, List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        window: float,
+        max_size: int,
+    ) -> None:
+        self._fn = fn
+        self.window = float(window)
+        self.max_size = max(1, int(max_size))
+        self._pending: Dict[Hashable, List[Tuple[Hashable, "asyncio.Future[Any]"]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: "set[asyncio.Task[Any]]" = set()
+        self.batches = 0
+        self.items = 0
+
+    def __len__(self) -> int:
+        return sum(len(batch) for batch in self._pending.values())
+
+    async def submit(self, group: Hashable, item: Hashable) -> Any:
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[Any]" = loop.create_future()
+        batch = self._pending.setdefault(group, [])
+        batch.append((item, future))
+        if len(batch) >= self.max_size:
+            self._flush(group)
+        elif len(batch) == 1:
+            self._timers[group] = loop.call_later(self.window, self._flush, group)
+        return await future
+
+    def _flush(self, group: Hashable) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group, None)
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+        task = asyncio.ensure_future(self._run(group, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: Hashable, batch: List[Tuple[Hashable, "asyncio.Future[Any]"]]) -> None:
+        items = list(dict.fromkeys(item for item, _ in batch))
+        try:
+            results = await self._fn(group, items)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for item, future in batch:
+            if not future.done():
+                future.set_result(results.get(item))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "pending": len(self),
+        }
+
+
+# ---------------------------
+# Persistent on-disk tier
+# ---------------------------
+
+class DiskCache:
+    """SQLite-backed store of raw response bodies that survives restarts.
+
+    The file is opened in WAL mode so several worker processes on one host can
+    share it: readers never block each other and a single writer does not block
+    readers. Expiry times are wall-clock (``time.time()``) so they stay
+    meaningful across processes. Methods are blocking; call them via
+    ``asyncio.to_thread`` from the event loop. When the stored bytes exceed
+    ``max_bytes`` the file is compacted: expired rows go first, then the least
+    recently read ones. The byte total lives in the file itself (kept by
+    triggers in the same transaction as each write), so every process sharing
+    it checks the cap against what all of them have written.
+    """
+
+    # recency is only written back this often per row, so hot reads stay read-only
+    TOUCH_INTERVAL_SECONDS = 60.0
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024, busy_timeout_ms: int = 5000) -> None:
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=busy_timeout_ms / 1000
+        )
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " body BLOB NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " path TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entries)")}
+        if "path" not in columns:
+            try:
+                self._conn.execute("ALTER TABLE entries ADD COLUMN path TEXT")
+            except sqlite3.OperationalError:
+                pass  # another process sharing the file added it first
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_path ON entries (path)")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO usage (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM entries"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries"
+                " BEGIN UPDATE usage SET bytes = bytes + new.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries"
+                " BEGIN UPDATE usage SET bytes = bytes - old.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries"
+                " BEGIN UPDATE usage SET bytes = bytes + new.size - old.size WHERE id = 0; END"
+            )
+        self.bytes = self._total_bytes()
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # IMMEDIATE takes the write lock up front, so the total read back is our own
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT bytes FROM usage WHERE id = 0").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Return ``(body, expires_at)`` for ``key`` or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[2] > self.TOUCH_INTERVAL_SECONDS:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return bytes(row[0]), float(row[1])
+
+    def put(self, key: str, body: bytes, expires_at: float, path: Optional[str] = None) -> None:
+        """Store ``body`` under ``key``; ``path`` (the upstream path) lets ``delete_paths`` find it."""
+        size = len(body)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock, self._transaction():
+            # an upsert, not REPLACE: REPLACE's implicit delete would skip the usage trigger
+            self._conn.execute(
+                "INSERT INTO entries (key, body, expires_at, size, accessed_at, path) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET body = excluded.body, expires_at = excluded.expires_at,"
+                " size = excluded.size, accessed_at = excluded.accessed_at, path = excluded.path",
+                (key, body, float(expires_at), size, time.time(), path),
+            )
+            # total across every process writing to this file
+            self.bytes = self._total_bytes()
+            over_budget = bool(self.max_bytes) and self.bytes > self.max_bytes
+        if over_budget:
+            self.compact()
+
+    def touch(self, key: str, expires_at: float) -> bool:
+        """Extend the expiry of an existing row without rewriting its body."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE entries SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (float(expires_at), time.time(), key),
+            )
+            return cur.rowcount > 0
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+            self.bytes = self._total_bytes()
+
+    def delete_paths(self, path: Optional[str] = None, prefix: Optional[str] = None) -> int:
+        """Delete rows stored for one upstream path, or for every path under ``prefix``.
+
+        Rows written without a path (by older versions) are not matched.
+        """
+        with self._lock:
+            if path is not None:
+                cur = self._conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+            elif prefix:
+                cur = self._conn.execute(
+                    "DELETE FROM entries WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+                )
+            else:
+                return 0
+            self.bytes = self._total_bytes()
+            return cur.rowcount
+
+    def compact(self) -> int:
+        """Drop expired rows, then trim to 90% of the budget. Returns rows removed."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+            self.bytes = self._total_bytes()
+            target = int(self.max_bytes * 0.9)
+            if self.max_bytes and self.bytes > target:
+                excess = self.bytes - target
+                freed = 0
+                victims = []
+                for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                    if freed >= excess:
+                        break
+                    victims.append((key,))
+                    freed += size
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                removed += len(victims)
+                self.bytes = self._total_bytes()
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self.compactions += 1
+            return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self.bytes = self._total_bytes()
+        return {
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "compactions": self.compactions,
+        }
+
+
+# ---------------------------
+# Payload compression
+# ---------------------------
+
+try:  # optional, faster than the stdlib codecs
+    import zstandard
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
+
+
+Codec = Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+
+def get_codec(name: str) -> Codec:
+    """Return ``(compress, decompress)`` for ``zlib``, ``lzma`` or ``zstd``."""
+    name = name.lower()
+    if name == "zlib":
+        return (lambda b: zlib.compress(b, 6)), zlib.decompress
+    if name == "lzma":
+        return lzma.compress, lzma.decompress
+    if name == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unknown cache compression codec: {name!r}")
+
+
+# ---------------------------
+# Snapshots
+# ---------------------------
+
+SNAPSHOT_MAGIC = b"ENSCACHE1\n"
+# meta length, body length, wall-clock expiry
+_SNAPSHOT_HEADER = struct.Struct("!IId")
+
+
+def pack_snapshot_record(meta: Dict[str, Any], body: bytes, expires_at: float) -> bytes:
+    """Encode one cache entry: fixed header, JSON metadata, raw response body."""
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode()
+    return _SNAPSHOT_HEADER.pack(len(meta_bytes), len(body), float(expires_at)) + meta_bytes + body
+
+
+async def read_snapshot(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[Tuple[Dict[str, Any], bytes, float]]:
+    """Decode ``(meta, body, expires_at)`` records from a stream of byte chunks.
+
+    Only the current partial record is buffered, so arbitrarily large
+    snapshots can be loaded with bounded memory.
+    """
+    buf = bytearray()
+    checked_magic = False
+    async for chunk in chunks:
+        buf.extend(chunk)
+        if not checked_magic:
+            if len(buf) < len(SNAPSHOT_MAGIC):
+                continue
+            if bytes(buf[: len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+                raise ValueError("Not a cache snapshot")
+            del buf[: len(SNAPSHOT_MAGIC)]
+            checked_magic = True
+        while len(buf) >= _SNAPSHOT_HEADER.size:
+            meta_len, body_len, expires_at = _SNAPSHOT_HEADER.unpack_from(buf)
+            end = _SNAPSHOT_HEADER.size + meta_len + body_len
+            if len(buf) < end:
+                break
+            meta = json.loads(bytes(buf[_SNAPSHOT_HEADER.size: _SNAPSHOT_HEADER.size + meta_len]))
+            body = bytes(buf[_SNAPSHOT_HEADER.size + meta_len: end])
+            del buf[:end]
+            yield meta, body, expires_at
+    if buf or not checked_magic:
+        raise ValueError("Truncated cache snapshot")
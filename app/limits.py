@@ -0,0 +1,315 @@
+from typing import Any, Deque, Dict, Hashable, Mapping, Optional
+
+import asyncio
+import email.utils
+import time
+from collections import Counter, deque
+
+
+# ---------------------------
+# Upstream rate limiting
+# ---------------------------
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def retry_after_seconds(headers: Mapping[str, str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+class RateLimitExceeded(Exception):
+    """Raised by ``RateLimiter.acquire`` when a token is further away than ``max_wait``."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"upstream rate limit: next slot in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token bucket shared by all upstream calls, tuned by the server's own headers.
+
+    Tokens refill at ``rate`` per second up to ``burst``; ``acquire`` waits for
+    one. ``observe`` reads each response: ``X-RateLimit-Remaining`` and
+    ``X-RateLimit-Reset`` spread what is left of the server's budget over the
+    rest of its window (never faster than the configured ``rate``), and a 429
+    blocks every caller until ``Retry-After`` has passed, or for an exponential
+    backoff when the header is missing. ``rate <= 0`` disables pacing but still
+    honours the server's blocks.
+
+    A caller that would wait longer than ``max_wait`` (0 = no bound) gets
+    ``RateLimitExceeded`` at once instead of queueing. ``share`` is this
+    process's part of the server's budget (1/workers when several processes
+    share one client IP); it scales the budget learned from headers, while
+    ``rate`` and ``burst`` are passed in already per process.
+    """
+
+    MAX_BACKOFF_SECONDS = 60.0
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float = 0.0,
+        backoff: float = 1.0,
+        max_wait: float = 0.0,
+        share: float = 1.0,
+    ) -> None:
+        self.max_rate = float(rate)
+        self.max_wait = float(max_wait)
+        self.share = min(max(float(share), 0.0), 1.0) or 1.0
+        self.rate = self.max_rate
+        self.burst = max(1.0, float(burst) or self.max_rate)
+        self.backoff = float(backoff)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_429 = 0
+        self._lock = asyncio.Lock()
+        self.limit: Optional[float] = None
+        self.remaining: Optional[float] = None
+        self.reset_at: Optional[float] = None
+        self.acquired = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+        self.rate_limited = 0
+        self.rejected = 0
+
+    def _refill(self, now: float) -> None:
+        if self.reset_at is not None and now >= self.reset_at:
+            # the server's window is over; its next response tells us the new budget
+            self.rate, self.reset_at = self.max_rate, None
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        deadline = now + self.max_wait if self.max_wait > 0 else None
+        if deadline is not None and self._blocked_until > deadline:
+            # e.g. budget exhausted until the hourly reset: no point queueing
+            self._reject(self._blocked_until - now)
+        try:
+            # the lock keeps waiters in arrival order, so a burst is released evenly
+            if deadline is None:
+                await self._lock.acquire()
+            else:
+                await asyncio.wait_for(self._lock.acquire(), deadline - now)
+        except asyncio.TimeoutError:
+            self._reject(max(self._blocked_until - time.monotonic(), self._token_interval()))
+        try:
+            waited = 0.0
+            while True:
+                now = time.monotonic()
+                delay = self._blocked_until - now
+                if delay <= 0 and self.rate > 0:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    delay = (1 - self._tokens) / self.rate
+                elif delay <= 0:
+                    break
+                if deadline is not None and now + delay > deadline:
+                    self._reject(delay)
+                waited += delay
+                await asyncio.sleep(delay)
+            self.acquired += 1
+            if waited:
+                self.throttled += 1
+                self.waited_seconds += waited
+        finally:
+            self._lock.release()
+
+    def _token_interval(self) -> float:
+        return 1.0 / self.rate if self.rate > 0 else 0.0
+
+    def _reject(self, retry_after: float) -> None:
+        self.rejected += 1
+        raise RateLimitExceeded(max(retry_after, 0.0))
+
+    def observe(self, status_code: int, headers: Mapping[str, str]) -> None:
+        now = time.monotonic()
+        self.limit = _header_float(headers, "X-RateLimit-Limit") or self.limit
+        remaining = _header_float(headers, "X-RateLimit-Remaining")
+        reset = _header_float(headers, "X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            self.remaining, self.reset_at = remaining, now + reset
+            if remaining < 1:
+                self._block(now + reset)
+            elif self.max_rate > 0:
+                self._refill(now)
+                self.rate = min(self.max_rate, remaining * self.share / max(reset, 1.0))
+        if status_code == 429:
+            self.rate_limited += 1
+            self._consecutive_429 += 1
+            wait = retry_after_seconds(headers)
+            if wait is None:
+                wait = min(self.MAX_BACKOFF_SECONDS, self.backoff * 2 ** (self._consecutive_429 - 1))
+            self._block(now + wait)
+            self._tokens = 0.0
+        else:
+            self._consecutive_429 = 0
+
+    def _block(self, until: float) -> None:
+        self._blocked_until = max(self._blocked_until, until)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "tokens": round(self._tokens, 3),
+            "blocked_for": round(max(0.0, self._blocked_until - now), 3),
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_in": round(max(0.0, self.reset_at - now), 3) if self.reset_at is not None else None,
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "rate_limited": self.rate_limited,
+            "rejected": self.rejected,
+            "max_wait": self.max_wait,
+            "share": self.share,
+        }
+
+
+# ---------------------------
+# Adaptive concurrency
+# ---------------------------
+
+class ConcurrencyLimiter:
+    """AIMD cap on in-flight upstream calls, driven by their latency and errors.
+
+    Each call holds a slot between ``acquire`` and ``release``. Every ``kind``
+    of call (e.g. method and path prefix) keeps two moving averages of its
+    successful latencies: a short one over the last ten or so calls and a slow
+    baseline over the last hundred or so. While the short average stays within
+    ``tolerance`` times the baseline, each success grows the limit by
+    ``1/limit`` (about +1 per round of calls); an error, or the short average
+    rising past that, cuts it by ``decrease``, at most once per round: only
+    calls started after the last cut can cut again. Comparing averages rather
+    than single calls keeps ordinary jitter and the odd large download from
+    reading as congestion, and per-kind averages keep an endpoint that is
+    always slow from doing so. Callers beyond the
+    limit queue in order for up to ``max_wait`` seconds, then ``acquire``
+    raises ``TimeoutError``.
+    """
+
+    SHORT_WEIGHT = 0.1
+    BASELINE_WEIGHT = 0.01
+
+    def __init__(
+        self,
+        initial: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        max_wait: float = 10.0,
+        tolerance: float = 2.0,
+        decrease: float = 0.5,
+    ) -> None:
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(int(initial), self.min_limit), self.max_limit))
+        self.max_wait = float(max_wait)
+        self.tolerance = float(tolerance)
+        self.decrease = float(decrease)
+        self.in_flight = 0
+        self.baselines: Dict[Hashable, float] = {}
+        self.recent: Dict[Hashable, float] = {}
+        self._samples: Counter = Counter()
+        self.last_latency: Optional[float] = None
+        self._last_decrease = float("-inf")
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self.queued = 0
+        self.rejected = 0
+        self.increases = 0
+        self.decreases = 0
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the start time to hand back to ``release``."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return time.monotonic()
+        self.queued += 1
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # the slot is handed over by _wake, which counts it as in flight
+            await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # given a slot just as the caller went away: pass it on
+                self.in_flight -= 1
+                self._wake()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                self.rejected += 1
+            raise
+        return time.monotonic()
+
+    def release(self, started: float, ok: bool = True, kind: Hashable = None) -> None:
+        now = time.monotonic()
+        latency = now - started
+        self.in_flight -= 1
+        self.last_latency = latency
+        if ok:
+            self._samples[kind] += 1
+            # plain means until a kind has enough calls for the weights to apply
+            n = self._samples[kind]
+            short = self.recent.get(kind, latency)
+            self.recent[kind] = short + (latency - short) * max(self.SHORT_WEIGHT, 1.0 / n)
+            baseline = self.baselines.get(kind, latency)
+            self.baselines[kind] = baseline + (latency - baseline) * max(self.BASELINE_WEIGHT, 1.0 / n)
+        slow = kind in self.baselines and self.recent[kind] > self.baselines[kind] * self.tolerance
+        if not ok or slow:
+            if started >= self._last_decrease:
+                self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                self._last_decrease = now
+                self.decreases += 1
+        elif self.limit < self.max_limit:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self.increases += 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "baselines_ms": {str(kind): round(b * 1000, 1) for kind, b in self.baselines.items()},
+            "recent_ms": {str(kind): round(r * 1000, 1) for kind, r in self.recent.items()},
+            "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+        }
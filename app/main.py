@@ -1,21 +1,43 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
 
 import asyncio
+from collections import Counter
 import os
 import logging
+import math
+import random
+import re
 import hashlib
+import hmac
 import json
+import time
 import httpx
 import pandas as pd
-from fastapi import FastAPI, HTTPException, Query
+from pandera.errors import SchemaErrors
+from fastapi import Body, FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.cache import (
+    SNAPSHOT_MAGIC,
+    Codec,
+    DiskCache,
+    LRUCache,
+    MicroBatcher,
+    SingleFlight,
+    TinyLFU,
+    get_codec,
+    pack_snapshot_record,
+    read_snapshot,
+)
+from app.limits import ConcurrencyLimiter, RateLimiter, RateLimitExceeded
 from app.schema import (
     ensembl_transcripts_schema,
     ensembl_gene_annotation_schema,
     ensembl_variant_summary_schema,
     ensembl_variation_mappings_schema,
     ensembl_orthologs_schema,
+    schema_fingerprint,
 )
 
 
@@ -55,7 +77,7 @@ app.add_middleware(RequestTimingMiddleware)
 def root() -> Dict[str, str]:
     return {
         "message": "Pandera Validator API",
-        "endpoints": "/ensembl/gene-annotation, /ensembl/gene-transcripts, /ensembl/variation, /ensembl/orthologs",
+        "endpoints": "/ensembl/gene-annotation, /ensembl/gene-annotation/batch, /ensembl/gene-transcripts, /ensembl/variation, /ensembl/variation/batch, /ensembl/orthologs",
     }
 
 
@@ -81,6 +103,102 @@ ENSEMBL_REST = os.getenv("ENSEMBL_BASE_URL", "https://rest.ensembl.org")
 DEFAULT_TIMEOUT_SECONDS = _env_float("ENSEMBL_TIMEOUT_SECONDS", 30.0)
 DEFAULT_CACHE_TTL_SECONDS = _env_float("ENSEMBL_CACHE_TTL_SECONDS", 30.0)
 DEFAULT_RETRIES = _env_int("ENSEMBL_RETRIES", 3)
+DEFAULT_CACHE_MAX_ENTRIES = _env_int("ENSEMBL_CACHE_MAX_ENTRIES", 10_000)
+DEFAULT_CACHE_MAX_BYTES = _env_int("ENSEMBL_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+# decoded JSON (dicts, lists, str/int objects) takes this many times its wire size in
+# memory; measured at ~3.2 on an expanded /lookup/id payload. Uncompressed entries are
+# charged body size x this factor, so the byte budget bounds real memory use
+DEFAULT_CACHE_DECODED_SIZE_FACTOR = _env_float("ENSEMBL_CACHE_DECODED_SIZE_FACTOR", 3.2)
+# "lru" admits every new entry; "tinylfu" keeps one-off keys from evicting hot ones
+CACHE_ADMISSION = os.getenv("ENSEMBL_CACHE_ADMISSION", "lru").lower()
+# background reclamation of expired entries; grace keeps them a while for ETag revalidation
+DEFAULT_CACHE_SWEEP_INTERVAL_SECONDS = _env_float("ENSEMBL_CACHE_SWEEP_INTERVAL_SECONDS", 5.0)
+DEFAULT_CACHE_SWEEP_GRACE_SECONDS = _env_float("ENSEMBL_CACHE_SWEEP_GRACE_SECONDS", 60.0)
+# XFetch aggressiveness: >1 refreshes earlier, <1 later, 0 disables early refresh
+DEFAULT_CACHE_XFETCH_BETA = _env_float("ENSEMBL_CACHE_XFETCH_BETA", 1.0)
+# expired entries younger than this are served while one background task refreshes them
+DEFAULT_CACHE_MAX_STALE_SECONDS = _env_float("ENSEMBL_CACHE_MAX_STALE_SECONDS", 0.0)
+# 4xx answers (retired / mistyped IDs) are remembered separately and briefly
+DEFAULT_NEGATIVE_CACHE_TTL_SECONDS = _env_float("ENSEMBL_NEGATIVE_CACHE_TTL_SECONDS", 10.0)
+DEFAULT_NEGATIVE_CACHE_MAX_ENTRIES = _env_int("ENSEMBL_NEGATIVE_CACHE_MAX_ENTRIES", 5_000)
+# keep cached bodies compressed (zlib, lzma, zstd) and decode on access; empty = off
+CACHE_COMPRESSION = os.getenv("ENSEMBL_CACHE_COMPRESSION", "")
+# memoised {"valid", "num_rows", ...} results keyed by payload hash + schema
+DEFAULT_VALIDATION_CACHE_MAX_ENTRIES = _env_int("ENSEMBL_VALIDATION_CACHE_MAX_ENTRIES", 10_000)
+# normalised DataFrames kept per payload so hit paths skip json_normalize; 0 = off
+DEFAULT_TABLE_CACHE_MAX_BYTES = _env_int("ENSEMBL_TABLE_CACHE_MAX_BYTES", 0)
+DEFAULT_TABLE_CACHE_MAX_ENTRIES = _env_int("ENSEMBL_TABLE_CACHE_MAX_ENTRIES", 10_000)
+# optional SQLite tier behind the memory cache; empty = disabled
+DISK_CACHE_DIR = os.getenv("ENSEMBL_DISK_CACHE_DIR", "")
+DEFAULT_DISK_CACHE_MAX_BYTES = _env_int("ENSEMBL_DISK_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+# rate limiting / timeouts are not facts about the requested ID
+_UNCACHEABLE_CLIENT_ERRORS = {408, 429}
+# client-side pacing below Ensembl's documented 15 requests/second (0 = only obey the
+# server's headers); a 429 is retried after Retry-After this many times
+DEFAULT_RATE_LIMIT_PER_SECOND = _env_float("ENSEMBL_RATE_LIMIT_PER_SECOND", 15.0)
+DEFAULT_RATE_LIMIT_BURST = _env_float("ENSEMBL_RATE_LIMIT_BURST", 15.0)
+DEFAULT_RATE_LIMIT_RETRIES = _env_int("ENSEMBL_RATE_LIMIT_RETRIES", 3)
+# rate and burst above are for the whole host; each worker process paces at its share.
+# uvicorn --workers sets WEB_CONCURRENCY, which is used when this is not given
+DEFAULT_RATE_LIMIT_WORKERS = max(1, _env_int("ENSEMBL_RATE_LIMIT_WORKERS", _env_int("WEB_CONCURRENCY", 1)))
+# a request that would wait longer than this for the rate limit fails with 503 instead
+DEFAULT_RATE_LIMIT_MAX_WAIT_SECONDS = _env_float("ENSEMBL_RATE_LIMIT_MAX_WAIT_SECONDS", 10.0)
+# adaptive cap on in-flight upstream calls; callers over it queue, then get a 503
+DEFAULT_CONCURRENCY_INITIAL = _env_int("ENSEMBL_CONCURRENCY_INITIAL", 20)
+DEFAULT_CONCURRENCY_MIN = _env_int("ENSEMBL_CONCURRENCY_MIN", 2)
+DEFAULT_CONCURRENCY_MAX = _env_int("ENSEMBL_CONCURRENCY_MAX", 100)
+DEFAULT_CONCURRENCY_MAX_WAIT_SECONDS = _env_float("ENSEMBL_CONCURRENCY_MAX_WAIT_SECONDS", 10.0)
+# a call slower than this multiple of the unloaded latency counts as congestion
+DEFAULT_CONCURRENCY_LATENCY_TOLERANCE = _env_float("ENSEMBL_CONCURRENCY_LATENCY_TOLERANCE", 2.0)
+# Ensembl data is immutable within a release: poll the release number, key the
+# cache on it and keep entries much longer once it is known (0 = no polling)
+DEFAULT_RELEASE_POLL_SECONDS = _env_float("ENSEMBL_RELEASE_POLL_SECONDS", 300.0)
+DEFAULT_RELEASE_CACHE_TTL_SECONDS = _env_float("ENSEMBL_RELEASE_CACHE_TTL_SECONDS", 86_400.0)
+# fetch /lookup/id with expand=1 for gene-annotation too, so one upstream call and
+# one cache entry serve both gene endpoints
+LOOKUP_EXPAND_BY_DEFAULT = os.getenv("ENSEMBL_LOOKUP_EXPAND_BY_DEFAULT", "1").lower() not in ("0", "false", "no")
+_EXPANDED_LOOKUP_PARAMS = {"expand": 1}
+# Ensembl's limit for POST /lookup/id
+LOOKUP_BATCH_SIZE = 1000
+# concurrent single-ID lookup misses arriving within this window go upstream as one
+# POST /lookup/id (0 = off); a batch is sent early once it holds the max size
+DEFAULT_LOOKUP_BATCH_WINDOW_MS = _env_float("ENSEMBL_LOOKUP_BATCH_WINDOW_MS", 0.0)
+DEFAULT_LOOKUP_BATCH_MAX_SIZE = _env_int("ENSEMBL_LOOKUP_BATCH_MAX_SIZE", 200)
+# Ensembl's limit for POST /variation/{species}
+VARIATION_BATCH_SIZE = 200
+# upstream POSTs in flight at once for one batch endpoint request
+BATCH_CONCURRENCY = _env_int("ENSEMBL_BATCH_CONCURRENCY", 4)
+# rewrite species aliases, versioned stable IDs and rsID case before computing cache keys
+CANONICALIZE_KEYS = os.getenv("ENSEMBL_CANONICALIZE_KEYS", "1").lower() not in ("0", "false", "no")
+# seed aliases until /info/species has been loaded
+_DEFAULT_SPECIES_ALIASES = {
+    "human": "homo_sapiens",
+    "hsapiens": "homo_sapiens",
+    "mouse": "mus_musculus",
+    "mmusculus": "mus_musculus",
+    "rat": "rattus_norvegicus",
+    "zebrafish": "danio_rerio",
+    "chicken": "gallus_gallus",
+    "dog": "canis_lupus_familiaris",
+    "pig": "sus_scrofa",
+    "cow": "bos_taurus",
+    "fly": "drosophila_melanogaster",
+    "yeast": "saccharomyces_cerevisiae",
+}
+# ENSG00000139618.17 -> ENSG00000139618 (also transcripts, proteins, exons, other species' prefixes)
+_VERSIONED_STABLE_ID = re.compile(r"^(ENS[A-Z]*[GTPE]\d{11})\.\d+$", re.IGNORECASE)
+_RSID = re.compile(r"^rs\d+$", re.IGNORECASE)
+# snapshot produced by /admin/cache/export on a warm node, loaded at startup
+CACHE_SNAPSHOT_FILE = os.getenv("ENSEMBL_CACHE_SNAPSHOT_FILE", "")
+# POST /admin/cache/import writes straight into the response cache, so it is off unless
+# a token is configured and sent as "Authorization: Bearer <token>"
+CACHE_IMPORT_TOKEN = os.getenv("ENSEMBL_CACHE_IMPORT_TOKEN", "")
+# optional watchlist of gene / rsIDs fetched in the background at startup
+WARMUP_FILE = os.getenv("ENSEMBL_WARMUP_FILE", "")
+DEFAULT_WARMUP_CONCURRENCY = _env_int("ENSEMBL_WARMUP_CONCURRENCY", 8)
+WARMUP_SPECIES = os.getenv("ENSEMBL_WARMUP_SPECIES", "human")
+# upstream path prefixes reported separately by /admin/cache/stats
+_CACHE_PATH_PREFIXES = ("/lookup/id", "/variation", "/homology")
 
 
 @app.on_event("startup")
@@ -90,44 +208,373 @@ async def _startup() -> None:
         headers={"Content-Type": "application/json", "Accept": "application/json"},
         timeout=DEFAULT_TIMEOUT_SECONDS,
     )
-    app.state.cache: Dict[str, Dict[str, Any]] = {}
     app.state.retries = DEFAULT_RETRIES
+    _init_cache_state()
+    if app.state.disk_cache is not None:
+        await asyncio.to_thread(app.state.disk_cache.compact)
+    app.state.release_task = None
+    if DEFAULT_RELEASE_POLL_SECONDS > 0:
+        # learn the release before anything is cached, so warm entries are keyed on it
+        await _refresh_release()
+        app.state.release_task = asyncio.create_task(_poll_release(DEFAULT_RELEASE_POLL_SECONDS))
+    if CANONICALIZE_KEYS:
+        await _load_species_aliases()
+    if CACHE_SNAPSHOT_FILE:
+        await _import_snapshot_file(CACHE_SNAPSHOT_FILE)
+    app.state.sweeper_task = None
+    if DEFAULT_CACHE_SWEEP_INTERVAL_SECONDS > 0:
+        app.state.sweeper_task = asyncio.create_task(_sweep_expired(DEFAULT_CACHE_SWEEP_INTERVAL_SECONDS))
+    app.state.ready = not WARMUP_FILE
+    app.state.warmup_task = None
+    if WARMUP_FILE:
+        app.state.warmup_task = asyncio.create_task(_warm_cache(WARMUP_FILE, DEFAULT_WARMUP_CONCURRENCY))
+
+
+def _init_cache_state() -> None:
+    app.state.cache = LRUCache(
+        max_entries=DEFAULT_CACHE_MAX_ENTRIES,
+        max_bytes=DEFAULT_CACHE_MAX_BYTES,
+        admission=_admission_filter(DEFAULT_CACHE_MAX_ENTRIES),
+    )
     app.state.cache_ttl = DEFAULT_CACHE_TTL_SECONDS
+    app.state.release_cache_ttl = DEFAULT_RELEASE_CACHE_TTL_SECONDS
+    app.state.release: Optional[int] = None
+    app.state.cache_generation = 0
+    app.state.lookup_expand = LOOKUP_EXPAND_BY_DEFAULT
+    app.state.canonicalize = CANONICALIZE_KEYS
+    app.state.species_aliases = dict(_DEFAULT_SPECIES_ALIASES)
+    app.state.cache_max_stale = DEFAULT_CACHE_MAX_STALE_SECONDS
+    app.state.sweep_grace = DEFAULT_CACHE_SWEEP_GRACE_SECONDS
+    app.state.xfetch_beta = DEFAULT_CACHE_XFETCH_BETA
+    app.state.decoded_size_factor = max(DEFAULT_CACHE_DECODED_SIZE_FACTOR, 1.0)
+    app.state.cache_codec = _load_codec(CACHE_COMPRESSION)
+    app.state.negative_cache = LRUCache(max_entries=DEFAULT_NEGATIVE_CACHE_MAX_ENTRIES, max_bytes=0)
+    app.state.negative_cache_ttl = DEFAULT_NEGATIVE_CACHE_TTL_SECONDS
+    app.state.disk_cache = _open_disk_cache(DISK_CACHE_DIR)
+    app.state.validation_cache = LRUCache(max_entries=DEFAULT_VALIDATION_CACHE_MAX_ENTRIES, max_bytes=0)
+    app.state.table_cache = (
+        LRUCache(
+            max_entries=DEFAULT_TABLE_CACHE_MAX_ENTRIES,
+            max_bytes=DEFAULT_TABLE_CACHE_MAX_BYTES,
+            admission=_admission_filter(DEFAULT_TABLE_CACHE_MAX_ENTRIES),
+        )
+        if DEFAULT_TABLE_CACHE_MAX_BYTES > 0
+        else None
+    )
+    app.state.counters = Counter()
+    app.state.prefix_counters: Dict[str, Counter] = {}
+    # in-flight upstream fetches, keyed like the cache
+    app.state.inflight = SingleFlight()
+    app.state.rate_limiter = RateLimiter(
+        DEFAULT_RATE_LIMIT_PER_SECOND / DEFAULT_RATE_LIMIT_WORKERS,
+        DEFAULT_RATE_LIMIT_BURST / DEFAULT_RATE_LIMIT_WORKERS,
+        max_wait=DEFAULT_RATE_LIMIT_MAX_WAIT_SECONDS,
+        share=1.0 / DEFAULT_RATE_LIMIT_WORKERS,
+    )
+    app.state.concurrency_limiter = ConcurrencyLimiter(
+        initial=DEFAULT_CONCURRENCY_INITIAL,
+        min_limit=DEFAULT_CONCURRENCY_MIN,
+        max_limit=DEFAULT_CONCURRENCY_MAX,
+        max_wait=DEFAULT_CONCURRENCY_MAX_WAIT_SECONDS,
+        tolerance=DEFAULT_CONCURRENCY_LATENCY_TOLERANCE,
+    )
+    app.state.lookup_batcher = None
+    if DEFAULT_LOOKUP_BATCH_WINDOW_MS > 0:
+        app.state.lookup_batcher = MicroBatcher(
+            _lookup_batch,
+            DEFAULT_LOOKUP_BATCH_WINDOW_MS / 1000.0,
+            min(DEFAULT_LOOKUP_BATCH_MAX_SIZE, LOOKUP_BATCH_SIZE),
+        )
+
+
+def _admission_filter(max_entries: int) -> Optional[TinyLFU]:
+    if CACHE_ADMISSION != "tinylfu":
+        return None
+    return TinyLFU(capacity=max_entries or DEFAULT_CACHE_MAX_ENTRIES)
+
+
+def _load_codec(name: str) -> Optional[Codec]:
+    if not name:
+        return None
+    try:
+        return get_codec(name)
+    except ValueError as exc:
+        logger.warning(json.dumps({"event": "cache_compression_disabled", "error": str(exc)}))
+        return None
+
+
+def _open_disk_cache(directory: str) -> Optional[DiskCache]:
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return DiskCache(os.path.join(directory, "ensembl-cache.sqlite3"), max_bytes=DEFAULT_DISK_CACHE_MAX_BYTES)
 
 
 @app.on_event("shutdown")
 async def _shutdown() -> None:
+    for task in (app.state.warmup_task, app.state.release_task, app.state.sweeper_task):
+        if task is not None:
+            task.cancel()
     client: httpx.AsyncClient = app.state.http
     await client.aclose()
+    if app.state.disk_cache is not None:
+        app.state.disk_cache.close()
+
+
+# (release, path, sorted query items): hashable and cheap to build on the hot path
+CacheKey = Tuple[Optional[int], str, Tuple[Tuple[str, str], ...]]
+
+
+def _cache_key(path: str, params: Optional[Dict[str, Any]], release: Optional[int] = None) -> CacheKey:
+    if not params:
+        return (release, path, ())
+    # query values go over the wire as strings, so expand=1 and expand="1" are one entry
+    return (release, path, tuple(sorted((str(k), str(v)) for k, v in params.items())))
+
+
+def _stable_key(key: CacheKey) -> str:
+    """Process-independent digest of a cache key, for the shared disk tier."""
+    # repr of str/int/None tuples is deterministic, unlike hash() of str
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def _cache_ttl() -> float:
+    # within a known release the data cannot change, so entries can live much longer
+    if app.state.release is not None:
+        return float(app.state.release_cache_ttl)
+    return float(app.state.cache_ttl)
+
+
+async def _poll_release(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await _refresh_release()
+
+
+async def _refresh_release() -> None:
+    try:
+        resp = await _upstream_request("GET", "/info/data")
+        resp.raise_for_status()
+        releases = resp.json().get("releases") or []
+        if releases:
+            _set_release(int(max(releases)))
+    except (httpx.HTTPError, HTTPException, ValueError) as exc:
+        logger.warning(json.dumps({"event": "release_poll_failed", "error": str(exc)}))
+    except Exception as exc:
+        # e.g. /info/data returned a list or a non-numeric release: keep polling
+        logger.warning(json.dumps({"event": "release_poll_failed", "error": repr(exc)}))
+
+
+async def _sweep_expired(interval: float, batch: int = 10_000) -> None:
+    """Periodically reclaim entries past their deadline, in bounded batches."""
+    while True:
+        await asyncio.sleep(interval)
+        for cache in (app.state.cache, app.state.negative_cache):
+            while True:
+                removed = cache.expire(asyncio.get_event_loop().time(), limit=batch)
+                app.state.counters["swept"] += removed
+                if removed < batch:
+                    break
+                await asyncio.sleep(0)  # let requests run between batches
+
 
+def _set_release(release: int) -> None:
+    """Switch cache generation when Ensembl publishes a new release."""
+    previous = app.state.release
+    if release == previous:
+        return
+    # no await between these lines: requests see either the old or the new generation
+    app.state.release = release
+    app.state.cache.clear()
+    app.state.negative_cache.clear()
+    app.state.cache_generation += 1
+    logger.info(json.dumps({
+        "event": "ensembl_release_changed",
+        "previous": previous,
+        "release": release,
+        "generation": app.state.cache_generation,
+    }))
 
-def _cache_key(path: str, params: Optional[Dict[str, Any]]) -> str:
-    payload = json.dumps({"path": path, "params": params or {}}, sort_keys=True)
-    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _path_prefix(path: str) -> str:
+    for prefix in _CACHE_PATH_PREFIXES:
+        if path.startswith(prefix):
+            return prefix
+    return "/" + path.strip("/").split("/", 1)[0]
+
+
+def _count(prefix: str, name: str) -> None:
+    app.state.counters[name] += 1
+    app.state.prefix_counters.setdefault(prefix, Counter())[name] += 1
+
+
+# ---------------------------
+# Cache key canonicalisation
+# ---------------------------
+
+async def _load_species_aliases() -> None:
+    """Extend the alias table from /info/species (name <- aliases, display name)."""
+    try:
+        resp = await _upstream_request("GET", "/info/species")
+        resp.raise_for_status()
+        species = resp.json().get("species") or []
+    except (httpx.HTTPError, HTTPException, ValueError) as exc:
+        logger.warning(json.dumps({"event": "species_aliases_failed", "error": str(exc)}))
+        return
+    aliases = dict(_DEFAULT_SPECIES_ALIASES)
+    for item in species:
+        name = (item.get("name") or "").lower()
+        if not name:
+            continue
+        for alias in list(item.get("aliases") or []) + [item.get("display_name") or "", item.get("common_name") or ""]:
+            alias = alias.strip().lower().replace(" ", "_")
+            if alias and alias != name:
+                aliases.setdefault(alias, name)
+    app.state.species_aliases = aliases
+    logger.info(json.dumps({"event": "species_aliases_loaded", "aliases": len(aliases)}))
+
+
+def _canonical_species(species: str) -> str:
+    species = species.strip().lower()
+    return app.state.species_aliases.get(species, species)
+
+
+def _canonical_id(identifier: str) -> str:
+    match = _VERSIONED_STABLE_ID.match(identifier)
+    if match:
+        return match.group(1).upper()
+    if _RSID.match(identifier):
+        return identifier.lower()
+    if identifier[:3].upper() == "ENS":
+        return identifier.upper()
+    return identifier
+
+
+def _canonicalize(
+    path: str, params: Optional[Dict[str, Any]]
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Rewrite equivalent requests to one form, used both for the cache key and upstream."""
+    if not getattr(app.state, "canonicalize", False):
+        return path, params
+    parts = path.split("/")
+    # ["", "variation", species, id] / ["", "lookup" | "homology", "id", id]
+    if len(parts) == 4 and parts[1] == "variation":
+        parts[2] = _canonical_species(parts[2])
+        parts[3] = _canonical_id(parts[3])
+    elif len(parts) == 4 and parts[1] in ("lookup", "homology") and parts[2] == "id":
+        parts[3] = _canonical_id(parts[3])
+    if params and "species" in params:
+        params = dict(params, species=_canonical_species(str(params["species"])))
+    return "/".join(parts), params
 
 
 async def _ensembl_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    # simple TTL cache
-    key = _cache_key(path, params)
+    canonical_path, canonical_params = _canonicalize(path, params)
+    rewritten = canonical_path != path or canonical_params != params
+    path, params = canonical_path, canonical_params
+    # bounded TTL + LRU cache
+    key = _cache_key(path, params, app.state.release)
+    prefix = _path_prefix(path)
+    if rewritten:
+        _count(prefix, "canonicalized")
+    now = asyncio.get_event_loop().time()
     entry = app.state.cache.get(key)
-    if entry and entry["expires_at"] > asyncio.get_event_loop().time():
-        return entry["data"]
+    if entry:
+        if entry["expires_at"] > now:
+            _count(prefix, "hits")
+            if rewritten:
+                # would have been a separate entry without canonicalisation
+                _count(prefix, "canonical_hits")
+            if _should_refresh_early(entry, now):
+                _count(prefix, "early_refreshes")
+                _refresh_in_background(key, path, params)
+            return _entry_data(entry)
+        _count(prefix, "expired")
+        if now < entry["expires_at"] + float(app.state.cache_max_stale):
+            # stale-while-revalidate: answer now, refresh once in the background
+            _count(prefix, "stale_served")
+            _refresh_in_background(key, path, params)
+            return _entry_data(entry)
+    negative = app.state.negative_cache.get(key)
+    if negative and negative["expires_at"] > now:
+        _count(prefix, "negative_hits")
+        raise HTTPException(status_code=negative["status"], detail=negative["detail"])
+    _count(prefix, "misses")
+    # concurrent misses for the same key share one upstream request
+    return await app.state.inflight.do(key, lambda: _fetch_and_cache(key, path, params))
+
+
+def _should_refresh_early(entry: Dict[str, Any], now: float) -> bool:
+    """XFetch: refresh before expiry with a probability that rises as expiry nears.
+
+    Expensive entries (large ``fetch_seconds``) start refreshing earlier, so
+    entries written together in a burst do not all expire together.
+    """
+    beta = float(app.state.xfetch_beta)
+    delta = entry.get("fetch_seconds") or 0.0
+    if beta <= 0 or delta <= 0:
+        return False
+    return now - delta * beta * math.log(1.0 - random.random()) >= entry["expires_at"]
+
+
+def _refresh_in_background(key: CacheKey, path: str, params: Optional[Dict[str, Any]]) -> None:
+    if key in app.state.inflight:
+        return
+    app.state.counters["background_refreshes"] += 1
+    task = app.state.inflight.start(key, lambda: _fetch_and_cache(key, path, params))
+    task.add_done_callback(lambda t: _log_refresh_failure(path, t))
+
+
+def _log_refresh_failure(path: str, task: "asyncio.Task[Any]") -> None:
+    if task.cancelled() or task.exception() is None:
+        return
+    app.state.counters["background_refresh_errors"] += 1
+    logger.warning(json.dumps({
+        "event": "cache_refresh_failed",
+        "path": path,
+        "error": str(task.exception()),
+    }))
 
+
+async def _fetch_and_cache(key: CacheKey, path: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    previous = app.state.cache.peek(key)
+    # only a disk entry newer than what we already hold (e.g. refreshed by another worker) helps
+    newer_than = 0.0
+    if previous is not None:
+        newer_than = time.time() + (previous["expires_at"] - asyncio.get_event_loop().time())
+    data = await _load_from_disk(key, path, params, newer_than)
+    if data is not None:
+        return data
+    # revalidate an expired entry instead of re-downloading it, if Ensembl gave us validators
+    headers = _conditional_headers(previous)
+    if not headers and app.state.lookup_batcher is not None and _is_single_lookup(path):
+        return await _fetch_batched(key, path, params)
+    started = asyncio.get_event_loop().time()
     # retries on transient errors
     last_exc: Optional[Exception] = None
     for attempt in range(int(app.state.retries)):
         try:
-            resp = await app.state.http.get(path, params=params or {})
+            if headers:
+                app.state.counters["revalidations"] += 1
+            resp = await _upstream_request("GET", path, params=params or {}, headers=headers)
+            if resp.status_code == 304 and previous is not None:
+                return await _extend_entry(key, previous)
             if resp.status_code >= 500:
                 raise HTTPException(status_code=resp.status_code, detail=resp.text)
             if resp.status_code >= 400:
                 # client error -> no retry
+                if resp.status_code not in _UNCACHEABLE_CLIENT_ERRORS:
+                    _remember_failure(key, path, resp.status_code, resp.text)
                 raise HTTPException(status_code=resp.status_code, detail=resp.text)
             data = resp.json()
-            app.state.cache[key] = {
-                "data": data,
-                "expires_at": asyncio.get_event_loop().time() + float(app.state.cache_ttl),
-            }
+            app.state.negative_cache.pop(key)
+            ttl = _cache_ttl()
+            fetch_seconds = asyncio.get_event_loop().time() - started
+            data = _store_entry(key, path, params, resp.content, data, ttl, resp.headers, fetch_seconds)
+            if app.state.disk_cache is not None:
+                await asyncio.to_thread(
+                    app.state.disk_cache.put, _stable_key(key), resp.content, time.time() + ttl, path
+                )
             return data
         except (httpx.ConnectError, httpx.ReadTimeout) as exc:
             last_exc = exc
@@ -138,16 +585,243 @@ async def _ensembl_get(path: str, params: Optional[Dict[str, Any]] = None) -> Di
     raise HTTPException(status_code=502, detail="Unknown upstream error")
 
 
-@app.get("/ensembl/gene-transcripts")
-async def ensembl_gene_transcripts(
-    species: str = Query(..., description="Species e.g. human, mouse"),
-    gene_id: str = Query(..., description="Stable gene ID e.g. ENSG00000139618"),
-) -> Dict[str, Any]:
-    data = await _ensembl_get(f"/lookup/id/{gene_id}", params={"expand": 1})
-    transcripts = [t for t in data.get("Transcript", [])]
-    df = pd.DataFrame.from_records(transcripts)
+async def _upstream_request(method: str, path: str, **kwargs: Any) -> httpx.Response:
+    """Send one request through the shared rate limiter, waiting out 429s."""
+    limiter: RateLimiter = app.state.rate_limiter
+    for attempt in range(max(0, DEFAULT_RATE_LIMIT_RETRIES) + 1):
+        try:
+            await limiter.acquire()
+        except RateLimitExceeded as exc:
+            app.state.counters["rate_limit_rejections"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Ensembl rate limit reached, try again later",
+                headers={"Retry-After": str(math.ceil(exc.retry_after))},
+            )
+        resp = await _limited_send(method, path, **kwargs)
+        limiter.observe(resp.status_code, resp.headers)
+        if resp.status_code != 429 or attempt == DEFAULT_RATE_LIMIT_RETRIES:
+            return resp
+        # the limiter now blocks every caller until Retry-After (or its backoff) has passed
+        app.state.counters["rate_limit_retries"] += 1
+        logger.warning(json.dumps({"event": "upstream_rate_limited", "path": path, "attempt": attempt + 1}))
+    return resp
+
+
+async def _limited_send(method: str, path: str, **kwargs: Any) -> httpx.Response:
+    """Send while holding a slot of the adaptive concurrency limit."""
+    concurrency: ConcurrencyLimiter = app.state.concurrency_limiter
+    try:
+        started = await concurrency.acquire()
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Too many concurrent upstream requests, try again later")
+    ok = False
+    try:
+        resp = await app.state.http.request(method, path, **kwargs)
+        ok = resp.status_code < 500 and resp.status_code != 429
+        return resp
+    finally:
+        concurrency.release(started, ok, kind=f"{method} {_path_prefix(path)}")
+
+
+def _remember_failure(key: CacheKey, path: str, status: int, detail: str) -> None:
+    expires_at = asyncio.get_event_loop().time() + float(app.state.negative_cache_ttl)
+    app.state.negative_cache.put(key, {
+        "path": path,
+        "status": status,
+        "detail": detail,
+        "expires_at": expires_at,
+    }, group=_path_prefix(path), deadline=expires_at)
+
+
+def _is_single_lookup(path: str) -> bool:
+    parts = path.split("/")
+    return len(parts) == 4 and parts[1] == "lookup" and parts[2] == "id" and bool(parts[3])
+
+
+async def _fetch_batched(key: CacheKey, path: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fetch one /lookup/id/{id} through the micro-batcher instead of its own GET."""
+    started = asyncio.get_event_loop().time()
+    group = _cache_key("", params)[2]  # batches only mix requests with identical params
+    data = await app.state.lookup_batcher.submit(group, path.rsplit("/", 1)[1])
+    if data is None:
+        detail = f"ID '{path.rsplit('/', 1)[1]}' not found"
+        _remember_failure(key, path, 404, detail)
+        raise HTTPException(status_code=404, detail=detail)
+    return await _cache_fetched(path, params, data, asyncio.get_event_loop().time() - started)
+
+
+async def _lookup_batch(group: Tuple[Tuple[str, str], ...], ids: List[str]) -> Dict[str, Any]:
+    app.state.counters["batched_lookups"] += len(ids)
+    return await _ensembl_post("/lookup/id", {"ids": ids}, params=dict(group) or None)
+
+
+async def _ensembl_post(path: str, payload: Dict[str, Any], params: Optional[Dict[str, Any]] = None) -> Any:
+    """Uncached POST to Ensembl, with the same retry policy as ``_fetch_and_cache``."""
+    last_exc: Optional[Exception] = None
+    for attempt in range(int(app.state.retries)):
+        try:
+            resp = await _upstream_request("POST", path, params=params or {}, json=payload)
+            if resp.status_code >= 400:
+                raise HTTPException(status_code=resp.status_code, detail=resp.text)
+            return resp.json()
+        except (httpx.ConnectError, httpx.ReadTimeout) as exc:
+            last_exc = exc
+            await asyncio.sleep(0.2 * (attempt + 1))  # backoff
+    raise HTTPException(status_code=502, detail=f"Upstream error: {last_exc}")
+
+
+async def _cache_fetched(
+    path: str, params: Optional[Dict[str, Any]], data: Any, fetch_seconds: float
+) -> Any:
+    """Store one item of a batch response as if it had been fetched on its own."""
+    key = _cache_key(path, params, app.state.release)
+    body = json.dumps(data).encode()
+    ttl = _cache_ttl()
+    app.state.negative_cache.pop(key)
+    data = _store_entry(key, path, params, body, data, ttl, fetch_seconds=fetch_seconds)
+    if app.state.disk_cache is not None:
+        await asyncio.to_thread(app.state.disk_cache.put, _stable_key(key), body, time.time() + ttl, path)
+    return data
+
+
+async def _load_from_disk(
+    key: CacheKey, path: str, params: Optional[Dict[str, Any]], newer_than: float = 0.0
+) -> Optional[Dict[str, Any]]:
+    # lazily promote an unexpired disk entry into memory
+    if app.state.disk_cache is None:
+        return None
+    hit = await asyncio.to_thread(app.state.disk_cache.get, _stable_key(key))
+    if hit is None:
+        return None
+    body, expires_at = hit
+    remaining = expires_at - time.time()
+    if remaining <= 0 or expires_at <= newer_than + 1.0:
+        return None
+    data = _store_entry(key, path, params, body, json.loads(body), remaining)
+    app.state.counters["disk_hits"] += 1
+    return data
+
+
+def _conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    if entry is None:
+        return headers
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+async def _extend_entry(key: CacheKey, entry: Dict[str, Any]) -> Any:
+    # 304 Not Modified: keep the cached body, just give it a new lease
+    ttl = _cache_ttl()
+    entry["expires_at"] = asyncio.get_event_loop().time() + ttl
+    _cache_put(key, entry)  # re-put: refreshes recency and the sweeper deadline
+    app.state.counters["not_modified"] += 1
+    app.state.counters["revalidation_bytes_saved"] += entry.get("raw_size", 0)
+    if app.state.disk_cache is not None:
+        await asyncio.to_thread(app.state.disk_cache.touch, _stable_key(key), time.time() + ttl)
+    return _entry_data(entry)
+
+
+def _store_entry(
+    key: CacheKey,
+    path: str,
+    params: Optional[Dict[str, Any]],
+    body: bytes,
+    data: Any,
+    ttl: float,
+    headers: Optional[httpx.Headers] = None,
+    fetch_seconds: float = 0.0,
+) -> Any:
+    """Put a decoded payload into the memory cache, compressed if configured.
+
+    Returns the payload tagged with the digest of ``body``, as hits will return it.
+    """
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    data = _with_digest(data, digest)
+    entry: Dict[str, Any] = {
+        "path": path,
+        "params": params,
+        "release": app.state.release,
+        "expires_at": asyncio.get_event_loop().time() + ttl,
+        "raw_size": len(body),
+        # identifies the payload for validation / table reuse without re-serialising it
+        "digest": digest,
+        # measured upstream cost, drives probabilistic early refresh
+        "fetch_seconds": fetch_seconds,
+    }
+    if headers is not None:
+        # upstream validators for conditional revalidation
+        entry["etag"] = headers.get("etag")
+        entry["last_modified"] = headers.get("last-modified")
+    codec = app.state.cache_codec
+    if codec is None:
+        entry["data"] = data
+        entry["stored_size"] = int(len(body) * app.state.decoded_size_factor)
+    else:
+        compress, _ = codec
+        entry["body"] = compress(body)
+        entry["stored_size"] = len(entry["body"])
+        logger.debug(json.dumps({
+            "event": "cache_store",
+            "path": path,
+            "raw_size": entry["raw_size"],
+            "stored_size": entry["stored_size"],
+        }))
+    _cache_put(key, entry)
+    return data
+
+
+def _cache_put(key: CacheKey, entry: Dict[str, Any]) -> None:
+    # keep expired entries around for stale serving and revalidation, then let the sweeper reclaim them
+    deadline = entry["expires_at"] + float(app.state.cache_max_stale) + float(app.state.sweep_grace)
+    app.state.cache.put(
+        key, entry, size=entry["stored_size"], group=_path_prefix(entry["path"]), deadline=deadline
+    )
+
+
+class _Payload(dict):
+    """A decoded JSON object that knows the digest of the upstream body it came from."""
+
+    __slots__ = ("digest",)
+
+
+def _with_digest(data: Any, digest: Optional[str]) -> Any:
+    if not digest or not isinstance(data, dict):
+        return data
+    payload = _Payload(data)
+    payload.digest = digest
+    return payload
+
+
+def _entry_data(entry: Dict[str, Any]) -> Any:
+    if "data" in entry:
+        return entry["data"]
+    return _with_digest(json.loads(_entry_body(entry)), entry.get("digest"))
+
+
+def _entry_body(entry: Dict[str, Any]) -> bytes:
+    """Raw JSON bytes of a cached payload."""
+    if "body" in entry:
+        _, decompress = app.state.cache_codec
+        return decompress(entry["body"])
+    return json.dumps(entry["data"], separators=(",", ":")).encode()
+
+
+def _payload_digest(data: Any) -> str:
+    digest = getattr(data, "digest", None)
+    if digest:
+        return digest  # computed once, when the body was cached
+    # byte-identical upstream bodies decode to dicts with identical key order
+    return hashlib.sha256(json.dumps(data, separators=(",", ":")).encode()).hexdigest()
+
+
+def _validate_frame(schema: Any, df: pd.DataFrame) -> Dict[str, Any]:
     try:
-        ensembl_transcripts_schema.validate(df, lazy=True)
+        schema.validate(df, lazy=True)
         valid = True
         errors: List[Dict[str, Any]] = []
     except Exception as err:  # pragma: no cover
@@ -156,12 +830,215 @@ async def ensembl_gene_transcripts(
     return {"valid": valid, "num_rows": int(df.shape[0]), "num_columns": int(df.shape[1]), "errors": errors}
 
 
+def _table_cache() -> Optional[LRUCache]:
+    return getattr(app.state, "table_cache", None)
+
+
+def _table_digest(data: Any) -> Optional[str]:
+    return _payload_digest(data) if _table_cache() is not None else None
+
+
+def _normalized(name: str, digest: Optional[str], normalize: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """Return ``normalize()``, reusing the frame built earlier from an identical payload.
+
+    Cached frames are shared between requests and must be treated as
+    read-only; pandera's ``validate`` and the endpoints' filters both return
+    new frames rather than modifying their input.
+    """
+    tables = _table_cache()
+    if tables is None or digest is None:
+        return normalize()
+    key = (name, digest)
+    df = tables.get(key)
+    if df is None:
+        df = normalize()
+        tables.put(key, df, size=int(df.memory_usage(deep=True).sum()), group=name)
+    else:
+        app.state.counters["table_hits"] += 1
+    return df
+
+
+def _memoized_validation(
+    name: str,
+    data: Any,
+    schema: Any,
+    normalize: Callable[[], pd.DataFrame],
+    select: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    options: Tuple[Hashable, ...] = (),
+) -> Dict[str, Any]:
+    """Validate the normalised payload against ``schema``, reusing results for identical payloads.
+
+    ``options`` are request parameters applied by ``select`` after
+    normalisation (e.g. a species filter); they are part of the result key but
+    not of the cached frame. The schema fingerprint makes results computed
+    against an older schema definition unreachable.
+    """
+    memo = getattr(app.state, "validation_cache", None)
+    digest = _payload_digest(data) if memo is not None or _table_cache() is not None else None
+
+    def frame() -> pd.DataFrame:
+        df = _normalized(name, digest, normalize)
+        return select(df) if select is not None else df
+
+    if memo is None:
+        return _validate_frame(schema, frame())
+    key = (name, options, digest, schema_fingerprint(schema))
+    result = memo.get(key)
+    if result is None:
+        result = _validate_frame(schema, frame())
+        memo.put(key, result)
+    else:
+        app.state.counters["validation_hits"] += 1
+    return dict(result, errors=list(result["errors"]))
+
+
+# ---------------------------
+# Startup warm-up
+# ---------------------------
+
+def _warmup_requests(identifier: str) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    """(path, params) pairs the /ensembl/* endpoints would request for an ID."""
+    if identifier.lower().startswith("rs"):
+        return [(f"/variation/{WARMUP_SPECIES}/{identifier}", None)]
+    requests: List[Tuple[str, Optional[Dict[str, Any]]]] = [
+        (f"/lookup/id/{identifier}", _EXPANDED_LOOKUP_PARAMS),
+        (f"/homology/id/{identifier}", {"type": "orthologues"}),
+    ]
+    if not app.state.lookup_expand:
+        requests.append((f"/lookup/id/{identifier}", None))
+    return requests
+
+
+def _read_watchlist(path: str) -> List[str]:
+    with open(path) as fh:
+        lines = (line.split("#", 1)[0].strip() for line in fh)
+        return [line for line in lines if line]
+
+
+async def _warm_cache(path: str, concurrency: int) -> None:
+    """Fetch every watchlist ID through _ensembl_get, then flip app.state.ready."""
+    start = asyncio.get_event_loop().time()
+    try:
+        ids = await asyncio.to_thread(_read_watchlist, path)
+    except OSError as exc:
+        logger.warning(json.dumps({"event": "warmup_failed", "file": path, "error": str(exc)}))
+        app.state.ready = True
+        return
+    requests = [req for identifier in ids for req in _warmup_requests(identifier)]
+    logger.info(json.dumps({"event": "warmup_start", "file": path, "ids": len(ids), "requests": len(requests)}))
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    progress = Counter()
+    report_every = max(len(requests) // 10, 1)
+
+    async def fetch(upstream_path: str, params: Optional[Dict[str, Any]]) -> None:
+        async with semaphore:
+            try:
+                await _ensembl_get(upstream_path, params)
+                progress["ok"] += 1
+            except HTTPException as exc:
+                progress["failed"] += 1
+                logger.warning(json.dumps({
+                    "event": "warmup_error",
+                    "path": upstream_path,
+                    "status": exc.status_code,
+                }))
+            except Exception as exc:
+                # e.g. an HTML maintenance page or a dropped connection: skip this ID, keep warming
+                progress["failed"] += 1
+                logger.warning(json.dumps({
+                    "event": "warmup_error",
+                    "path": upstream_path,
+                    "error": repr(exc),
+                }))
+            done = progress["ok"] + progress["failed"]
+            if done % report_every == 0:
+                logger.info(json.dumps({"event": "warmup_progress", "done": done, "total": len(requests)}))
+
+    try:
+        await asyncio.gather(*(fetch(p, params) for p, params in requests))
+    finally:
+        app.state.ready = True
+        logger.info(json.dumps({
+            "event": "warmup_done",
+            "ok": progress["ok"],
+            "failed": progress["failed"],
+            "duration_ms": round((asyncio.get_event_loop().time() - start) * 1000, 2),
+        }))
+
+
+@app.get("/ready")
+async def ready() -> Dict[str, bool]:
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Cache warm-up in progress")
+    return {"ready": True}
+
+
+def _cached_payload(path: str, params: Optional[Dict[str, Any]]) -> Optional[Any]:
+    """Fresh cached payload for a request, or None. Never waits on upstream.
+
+    A hit is a real cache hit: it refreshes recency, feeds the admission
+    sketch and may start an early refresh. A miss touches nothing, so the
+    caller's own fetch records it exactly once.
+    """
+    cache = getattr(app.state, "cache", None)
+    if cache is None:
+        return None
+    path, params = _canonicalize(path, params)
+    key = _cache_key(path, params, app.state.release)
+    now = asyncio.get_event_loop().time()
+    entry = cache.peek(key)
+    if entry is None or entry["expires_at"] <= now:
+        return None
+    cache.get(key)
+    prefix = _path_prefix(path)
+    _count(prefix, "hits")
+    if _should_refresh_early(entry, now):
+        _count(prefix, "early_refreshes")
+        _refresh_in_background(key, path, params)
+    return _entry_data(entry)
+
+
+async def _gene_lookup(gene_id: str) -> Dict[str, Any]:
+    """Gene-level /lookup/id payload, taken from the expanded form when possible."""
+    path = f"/lookup/id/{gene_id}"
+    if getattr(app.state, "lookup_expand", LOOKUP_EXPAND_BY_DEFAULT):
+        # the batch endpoint caches plain payloads; they hold every gene-level field
+        data = _cached_payload(path, None)
+        if data is None:
+            data = await _ensembl_get(path, params=_EXPANDED_LOOKUP_PARAMS)
+    else:
+        data = _cached_payload(path, _EXPANDED_LOOKUP_PARAMS)
+        if data is None:
+            data = await _ensembl_get(path)
+    if "Transcript" not in data:
+        return data
+    gene = {k: v for k, v in data.items() if k != "Transcript"}
+    # derived from the cached body, so table reuse does not re-serialise the gene
+    digest = getattr(data, "digest", None)
+    return _with_digest(gene, f"{digest}:gene" if digest else None)
+
+
+@app.get("/ensembl/gene-transcripts")
+async def ensembl_gene_transcripts(
+    species: str = Query(..., description="Species e.g. human, mouse"),
+    gene_id: str = Query(..., description="Stable gene ID e.g. ENSG00000139618"),
+) -> Dict[str, Any]:
+    data = await _ensembl_get(f"/lookup/id/{gene_id}", params=_EXPANDED_LOOKUP_PARAMS)
+    return _memoized_validation(
+        "gene-transcripts",
+        data,
+        ensembl_transcripts_schema,
+        lambda: pd.DataFrame.from_records([t for t in data.get("Transcript", [])]),
+    )
+
+
 @app.get("/ensembl/gene-annotation")
 async def ensembl_gene_annotation(
     gene_id: str = Query(..., description="Stable gene ID e.g. ENSG00000139618"),
 ) -> Dict[str, Any]:
-    data = await _ensembl_get(f"/lookup/id/{gene_id}")
-    df = pd.json_normalize(data)
+    data = await _gene_lookup(gene_id)
+    df = _normalized("gene-annotation", _table_digest(data), lambda: pd.json_normalize(data))
     try:
         ensembl_gene_annotation_schema.validate(df, lazy=True)
         valid = True
@@ -178,16 +1055,17 @@ async def ensembl_variation(
     variant_id: str = Query(..., description="Variant ID e.g. rs699"),
 ) -> Dict[str, Any]:
     data = await _ensembl_get(f"/variation/{species}/{variant_id}")
+    digest = _table_digest(data)
     # Summary (single-row)
-    df_summary = pd.json_normalize({
+    df_summary = _normalized("variation.summary", digest, lambda: pd.json_normalize({
         "id": data.get("name") or data.get("id"),
         "most_severe_consequence": data.get("most_severe_consequence"),
         "minor_allele": data.get("minor_allele"),
         "minor_allele_freq": data.get("minor_allele_freq"),
-    })
+    }))
     # Mappings
     mappings = data.get("mappings", [])
-    df_map = pd.json_normalize(mappings)
+    df_map = _normalized("variation.mappings", digest, lambda: pd.json_normalize(mappings))
 
     summary_result: Dict[str, Any]
     mappings_result: Dict[str, Any]
@@ -218,19 +1096,384 @@ async def ensembl_orthologs(
     target_species: Optional[str] = Query(None, description="Optional species filter, e.g. mouse"),
 ) -> Dict[str, Any]:
     data = await _ensembl_get(f"/homology/id/{gene_id}", params={"type": "orthologues"})
-    items = data.get("data", [])
-    homologies = items[0].get("homologies", []) if items else []
-    df = pd.json_normalize(homologies)
-    if target_species:
-        df = df[df.get("target.species").eq(target_species)]
+
+    def normalize() -> pd.DataFrame:
+        items = data.get("data", [])
+        homologies = items[0].get("homologies", []) if items else []
+        return pd.json_normalize(homologies)
+
+    def select(df: pd.DataFrame) -> pd.DataFrame:
+        if target_species:
+            df = df[df.get("target.species").eq(target_species)]
+        return df
+
+    return _memoized_validation(
+        "orthologs", data, ensembl_orthologs_schema, normalize, select=select, options=(target_species,)
+    )
+
+
+# ---------------------------
+# Batch endpoints
+# ---------------------------
+
+def _row_errors(schema: Any, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], Dict[Any, List[Dict[str, Any]]]]:
+    """Validate once; split failures into frame-level errors and errors per row label."""
     try:
-        ensembl_orthologs_schema.validate(df, lazy=True)
-        valid = True
-        errors: List[Dict[str, Any]] = []
-    except Exception as err:  # pragma: no cover
-        valid = False
-        errors = [{"error": str(err)}]
-    return {"valid": valid, "num_rows": int(df.shape[0]), "num_columns": int(df.shape[1]), "errors": errors}
+        schema.validate(df, lazy=True)
+        return [], {}
+    except SchemaErrors as err:
+        frame_errors: List[Dict[str, Any]] = []
+        by_row: Dict[Any, List[Dict[str, Any]]] = {}
+        for case in err.failure_cases.to_dict("records"):
+            error = {"column": case.get("column"), "check": str(case.get("check")), "value": str(case.get("failure_case"))}
+            index = case.get("index")
+            if index is None or (isinstance(index, float) and math.isnan(index)):
+                frame_errors.append(error)
+            else:
+                by_row.setdefault(index, []).append(error)
+        return frame_errors, by_row
+
+
+async def _fetch_many(
+    paths: Dict[str, str],
+    upstream: str,
+    chunk_size: int,
+    params: Optional[Dict[str, Any]] = None,
+    found: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, Any], int]:
+    """Payloads for ``{id: single-item path}`` (None = unknown) and how many went upstream.
+
+    Fresh memory or disk entries are used as is; only the misses are POSTed to
+    ``upstream``, ``chunk_size`` IDs per call and ``BATCH_CONCURRENCY`` calls
+    at a time. Each returned item is cached under the same key a request for
+    its single-item path would use. ``found`` holds payloads already resolved.
+    """
+    found = dict(found or {})
+    missing: List[str] = []
+    for item_id, path in paths.items():
+        if item_id in found:
+            continue
+        data = _cached_payload(path, params)
+        if data is None:
+            key = _cache_key(path, params, app.state.release)
+            # batch misses never go through cache.get; admission must still see them
+            app.state.cache.record_miss(key)
+            data = await _load_from_disk(key, path, params)
+        if data is None:
+            _count(_path_prefix(path), "misses")
+            missing.append(item_id)
+        else:
+            found[item_id] = data
+    semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+
+    async def fetch(chunk: List[str]) -> None:
+        async with semaphore:
+            started = asyncio.get_event_loop().time()
+            results = await _ensembl_post(upstream, {"ids": chunk}, params=params)
+            # the request's cost is shared by the entries it produced
+            fetch_seconds = (asyncio.get_event_loop().time() - started) / len(chunk)
+        for item_id in chunk:
+            data = results.get(item_id)
+            if data is not None:
+                data = await _cache_fetched(paths[item_id], params, data, fetch_seconds)
+            found[item_id] = data
+
+    await asyncio.gather(*(fetch(missing[i:i + chunk_size]) for i in range(0, len(missing), chunk_size)))
+    return found, len(missing)
+
+
+async def _lookup_many(gene_ids: List[str]) -> Tuple[Dict[str, Optional[Dict[str, Any]]], int]:
+    """Gene-level payloads for canonical IDs (None = unknown) and how many went upstream.
+
+    A cached expanded payload is reused, but misses are fetched plain: expanding
+    1000 genes downloads every transcript, exon and translation only to drop them.
+    """
+    paths = {gene_id: f"/lookup/id/{gene_id}" for gene_id in gene_ids}
+    expanded = {gene_id: _cached_payload(path, _EXPANDED_LOOKUP_PARAMS) for gene_id, path in paths.items()}
+    return await _fetch_many(
+        paths,
+        "/lookup/id",
+        LOOKUP_BATCH_SIZE,
+        found={gene_id: data for gene_id, data in expanded.items() if data is not None},
+    )
+
+
+@app.post("/ensembl/gene-annotation/batch")
+async def ensembl_gene_annotation_batch(
+    gene_ids: List[str] = Body(..., embed=True, description="Stable gene IDs e.g. [\"ENSG00000139618\"]"),
+) -> Dict[str, Any]:
+    """Validate many gene annotations with one upstream call per 1000 uncached IDs."""
+    canonical = {gene_id: _canonicalize(f"/lookup/id/{gene_id}", None)[0].rsplit("/", 1)[1] for gene_id in gene_ids}
+    found, fetched = await _lookup_many(list(dict.fromkeys(canonical.values())))
+    genes = {
+        gene_id: {k: v for k, v in data.items() if k != "Transcript"}
+        for gene_id, data in found.items()
+        if data is not None
+    }
+    # one frame, one validation pass; rows are labelled by gene ID
+    df = pd.json_normalize(list(genes.values()))
+    df.index = list(genes)
+    frame_errors, by_row = _row_errors(ensembl_gene_annotation_schema, df) if genes else ([], {})
+    results = []
+    for gene_id, canonical_id in canonical.items():
+        if canonical_id not in genes:
+            results.append({"gene_id": gene_id, "found": False, "valid": False, "errors": [{"error": "not found"}]})
+            continue
+        errors = frame_errors + by_row.get(canonical_id, [])
+        results.append({"gene_id": gene_id, "found": True, "valid": not errors, "errors": errors})
+    return {
+        "valid": all(r["valid"] for r in results),
+        "num_ids": len(results),
+        "num_rows": int(df.shape[0]),
+        "num_columns": int(df.shape[1]),
+        "fetched": fetched,
+        "errors": frame_errors,
+        "results": results,
+    }
+
+
+@app.post("/ensembl/variation/batch")
+async def ensembl_variation_batch(
+    species: str = Query(..., description="Species e.g. human"),
+    variant_ids: List[str] = Body(..., embed=True, description="Variant IDs e.g. [\"rs699\"]"),
+) -> Dict[str, Any]:
+    """Validate many variants: one summary frame and one mappings frame, each validated once."""
+    species_name = _canonical_species(species) if getattr(app.state, "canonicalize", False) else species
+    canonical = {
+        variant_id: _canonicalize(f"/variation/{species_name}/{variant_id}", None)[0].rsplit("/", 1)[1]
+        for variant_id in variant_ids
+    }
+    paths = {vid: f"/variation/{species_name}/{vid}" for vid in canonical.values()}
+    found, fetched = await _fetch_many(paths, f"/variation/{species_name}", VARIATION_BATCH_SIZE)
+    variants = {vid: data for vid, data in found.items() if data is not None}
+
+    df_summary = pd.json_normalize([{
+        "id": data.get("name") or data.get("id"),
+        "most_severe_consequence": data.get("most_severe_consequence"),
+        "minor_allele": data.get("minor_allele"),
+        "minor_allele_freq": data.get("minor_allele_freq"),
+    } for data in variants.values()])
+    df_summary.index = list(variants)
+    # mapping rows are labelled with the variant they belong to
+    mappings = [(vid, m) for vid, data in variants.items() for m in data.get("mappings", [])]
+    df_map = pd.json_normalize([m for _, m in mappings])
+    df_map.index = [vid for vid, _ in mappings]
+
+    summary_errors, summary_by_row = (
+        _row_errors(ensembl_variant_summary_schema, df_summary) if variants else ([], {})
+    )
+    map_errors, map_by_row = _row_errors(ensembl_variation_mappings_schema, df_map) if mappings else ([], {})
+    num_mappings = Counter(vid for vid, _ in mappings)
+    results = []
+    for variant_id, canonical_id in canonical.items():
+        if canonical_id not in variants:
+            results.append({"variant_id": variant_id, "found": False, "valid": False,
+                            "summary_errors": [{"error": "not found"}], "mappings_errors": [], "num_mappings": 0})
+            continue
+        s_errors = summary_errors + summary_by_row.get(canonical_id, [])
+        m_errors = (map_errors if num_mappings[canonical_id] else []) + map_by_row.get(canonical_id, [])
+        results.append({
+            "variant_id": variant_id,
+            "found": True,
+            "valid": not s_errors and not m_errors,
+            "summary_errors": s_errors,
+            "mappings_errors": m_errors,
+            "num_mappings": num_mappings[canonical_id],
+        })
+    return {
+        "valid": all(r["valid"] for r in results),
+        "num_ids": len(results),
+        "fetched": fetched,
+        "summary": {"valid": not summary_errors and not summary_by_row, "num_rows": int(df_summary.shape[0]),
+                    "num_columns": int(df_summary.shape[1]), "errors": summary_errors},
+        "mappings": {"valid": not map_errors and not map_by_row, "num_rows": int(df_map.shape[0]),
+                     "num_columns": int(df_map.shape[1]), "errors": map_errors},
+        "results": results,
+    }
+
+
+# ---------------------------
+# Cache administration
+# ---------------------------
+
+@app.get("/admin/cache/stats")
+async def admin_cache_stats() -> Dict[str, Any]:
+    # O(number of prefixes): everything below is maintained incrementally
+    cache: LRUCache = app.state.cache
+    # the disk tier's lock may be held by a long compaction; wait for it off the loop
+    disk = await asyncio.to_thread(app.state.disk_cache.stats) if app.state.disk_cache is not None else None
+    counters = app.state.counters
+    prefixes: Dict[str, Dict[str, int]] = {}
+    for prefix, stats in cache.group_stats().items():
+        prefixes[prefix] = {"entries": stats["entries"], "bytes": stats["bytes"], "evicted": stats["evictions"]}
+    for prefix, prefix_counters in app.state.prefix_counters.items():
+        row = prefixes.setdefault(prefix, {"entries": 0, "bytes": 0, "evicted": 0})
+        for name in ("hits", "misses", "expired", "negative_hits", "stale_served", "canonical_hits", "early_refreshes"):
+            row[name] = prefix_counters[name]
+    served = counters["hits"] + counters["stale_served"] + counters["negative_hits"]
+    lookups = served + counters["misses"]
+    return {
+        "release": app.state.release,
+        "generation": app.state.cache_generation,
+        "entries": len(cache),
+        "bytes": cache.bytes,
+        "max_entries": cache.max_entries,
+        "max_bytes": cache.max_bytes,
+        "hits": counters["hits"],
+        "misses": counters["misses"],
+        "expired": counters["expired"],
+        "hit_ratio": round(served / lookups, 4) if lookups else None,
+        # estimate: fresh hits on rewritten keys are counted as misses
+        "hit_ratio_without_canonicalization": (
+            round((served - counters["canonical_hits"]) / lookups, 4) if lookups else None
+        ),
+        "evicted": cache.evictions,
+        "rejected": cache.rejections,
+        "swept": cache.expirations,
+        "negative": {
+            "entries": len(app.state.negative_cache),
+            "hits": counters["negative_hits"],
+            "evicted": app.state.negative_cache.evictions,
+        },
+        "inflight": len(app.state.inflight),
+        "coalesced": app.state.inflight.coalesced,
+        "lookup_batches": app.state.lookup_batcher.stats() if app.state.lookup_batcher is not None else None,
+        "disk": disk,
+        "tables": _table_cache().stats() if _table_cache() is not None else None,
+        "counters": dict(counters),
+        "prefixes": prefixes,
+    }
+
+
+@app.get("/admin/upstream/stats")
+async def admin_upstream_stats() -> Dict[str, Any]:
+    return {
+        "rate_limit": app.state.rate_limiter.stats(),
+        "concurrency": app.state.concurrency_limiter.stats(),
+        "rate_limit_retries": app.state.counters["rate_limit_retries"],
+        "rate_limit_rejections": app.state.counters["rate_limit_rejections"],
+    }
+
+
+@app.post("/admin/cache/purge")
+async def admin_cache_purge(
+    prefix: Optional[str] = Query(None, description="Upstream path prefix e.g. /lookup/id"),
+    key: Optional[str] = Query(None, description="Upstream path e.g. /lookup/id/ENSG00000139618"),
+) -> Dict[str, int]:
+    """Drop memory and disk entries for one upstream path or a whole prefix.
+
+    Disk rows are matched by their stored path, so rows this worker never
+    held in memory (evicted, or written by another worker) are purged too.
+    """
+    if not prefix and not key:
+        raise HTTPException(status_code=400, detail="Pass either 'prefix' or 'key'")
+
+    def matches(entry: Dict[str, Any]) -> bool:
+        path = entry.get("path") or ""
+        return path == key if key else path.startswith(prefix or "")
+
+    purged = await _purge_matching(app.state.cache, matches)
+    negative_purged = await _purge_matching(app.state.negative_cache, matches)
+    disk_purged = 0
+    if app.state.disk_cache is not None:
+        if key:
+            disk_purged = await asyncio.to_thread(app.state.disk_cache.delete_paths, path=key)
+        else:
+            disk_purged = await asyncio.to_thread(app.state.disk_cache.delete_paths, prefix=prefix)
+        if purged:
+            # rows written before paths were stored can still be found by key
+            await asyncio.to_thread(app.state.disk_cache.delete, [_stable_key(k) for k in purged])
+    return {"purged": len(purged), "negative_purged": len(negative_purged), "disk_purged": disk_purged}
+
+
+async def _purge_matching(cache: LRUCache, matches: Callable[[Dict[str, Any]], bool]) -> List[Hashable]:
+    purged: List[Hashable] = []
+    for i, (key, entry) in enumerate(list(cache.items())):
+        if matches(entry):
+            cache.pop(key)
+            purged.append(key)
+        if i % 5000 == 4999:
+            await asyncio.sleep(0)  # keep serving requests during large purges
+    return purged
+
+
+@app.get("/admin/cache/export")
+async def admin_cache_export() -> StreamingResponse:
+    """Stream unexpired entries as a binary snapshot (see app.cache.read_snapshot)."""
+    return StreamingResponse(_export_snapshot(), media_type="application/octet-stream")
+
+
+async def _export_snapshot() -> AsyncIterator[bytes]:
+    yield SNAPSHOT_MAGIC
+    # only references are copied here; each body is encoded as it is sent
+    keys = [key for key, _entry in app.state.cache.items()]
+    for i, key in enumerate(keys):
+        entry = app.state.cache.peek(key)
+        now = asyncio.get_event_loop().time()
+        if entry is None or entry["expires_at"] <= now or "path" not in entry:
+            continue
+        meta = {
+            "path": entry["path"],
+            "params": entry.get("params"),
+            "release": entry.get("release"),
+            "etag": entry.get("etag"),
+            "last_modified": entry.get("last_modified"),
+        }
+        yield pack_snapshot_record(meta, _entry_body(entry), time.time() + (entry["expires_at"] - now))
+        if i % 100 == 99:
+            await asyncio.sleep(0)
+
+
+@app.post("/admin/cache/import")
+async def admin_cache_import(request: Request) -> Dict[str, int]:
+    if not CACHE_IMPORT_TOKEN:
+        raise HTTPException(status_code=403, detail="Cache import is disabled (set ENSEMBL_CACHE_IMPORT_TOKEN)")
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {CACHE_IMPORT_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing import token")
+    try:
+        return await _import_snapshot(request.stream())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+async def _import_snapshot(chunks: AsyncIterator[bytes]) -> Dict[str, int]:
+    imported = skipped = 0
+    release = app.state.release
+    async for meta, body, expires_at in read_snapshot(chunks):
+        remaining = expires_at - time.time()
+        if remaining <= 0 or (release is not None and meta.get("release") not in (None, release)):
+            skipped += 1
+            continue
+        path, params = meta["path"], meta.get("params")
+        key = _cache_key(path, params, release)
+        headers = httpx.Headers({
+            name: value
+            for name, value in (("etag", meta.get("etag")), ("last-modified", meta.get("last_modified")))
+            if value
+        })
+        _store_entry(key, path, params, body, json.loads(body), remaining, headers)
+        if app.state.disk_cache is not None:
+            await asyncio.to_thread(app.state.disk_cache.put, _stable_key(key), body, expires_at, path)
+        imported += 1
+    return {"imported": imported, "skipped": skipped}
+
+
+async def _import_snapshot_file(path: str) -> None:
+    async def chunks() -> AsyncIterator[bytes]:
+        with open(path, "rb") as fh:
+            while True:
+                chunk = await asyncio.to_thread(fh.read, 1024 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+
+    try:
+        result = await _import_snapshot(chunks())
+    except (OSError, ValueError) as exc:
+        logger.warning(json.dumps({"event": "snapshot_import_failed", "file": path, "error": str(exc)}))
+        return
+    logger.info(json.dumps({"event": "snapshot_imported", "file": path, **result}))
 
 
 @app.get("/ensembl/variation")
@@ -1,3 +1,6 @@
+import hashlib
+from typing import Dict, Tuple
+
 import pandas as pd
 import pandera.pandas as pa
 from pandera import Check
@@ -79,3 +82,36 @@ ensembl_orthologs_schema = pa.DataFrameSchema(
 )
 
 
+# id(schema) -> (schema, fingerprint); holding the schema keeps its id from being reused
+_FINGERPRINTS: Dict[int, Tuple[pa.DataFrameSchema, str]] = {}
+
+
+def schema_fingerprint(schema: pa.DataFrameSchema) -> str:
+    """Stable digest of a schema's definition (columns, dtypes, flags, checks).
+
+    Used to key memoised validation results, so editing a schema above
+    invalidates every result computed against the old definition. Computed
+    once per schema object: pandera's schema methods return new objects
+    rather than changing one in place.
+    """
+    cached = _FINGERPRINTS.get(id(schema))
+    if cached is not None and cached[0] is schema:
+        return cached[1]
+    fingerprint = _compute_fingerprint(schema)
+    _FINGERPRINTS[id(schema)] = (schema, fingerprint)
+    return fingerprint
+
+
+def _compute_fingerprint(schema: pa.DataFrameSchema) -> str:
+    parts = [repr((schema.strict, schema.coerce, schema.ordered, [repr(c) for c in schema.checks]))]
+    for name, col in schema.columns.items():
+        parts.append(repr((
+            name,
+            str(col.dtype),
+            col.nullable,
+            col.coerce,
+            col.required,
+            col.unique,
+            [repr(c) for c in col.checks],
+        )))
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
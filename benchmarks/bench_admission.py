@@ -0,0 +1,86 @@
+"""Compare cache hit ratio of plain LRU against LRU + TinyLFU admission.
+
+Run from the project root:
+
+    python benchmarks/bench_admission.py [--log access.log] [--capacity 1000]
+
+``--log`` replays a recorded trace: either the service's JSON request log
+(one ``{"event": "request", "path": ...}`` object per line) or plain text with
+one cache key per line. Without it, a synthetic trace is used: Zipf-distributed
+hot genes interleaved with bursts of one-off batch lookups.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.cache import LRUCache, TinyLFU  # noqa: E402
+
+
+def _read_trace(path):
+    keys = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                if record.get("event") == "request" and record.get("path"):
+                    keys.append(record["path"])
+            else:
+                keys.append(line)
+    return keys
+
+
+def _synthetic_trace(n, hot_keys, scan_every, scan_length, seed=0):
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(hot_keys)]
+    hot = rng.choices(range(hot_keys), weights=weights, k=n)
+    keys = []
+    scan_id = 0
+    for i, h in enumerate(hot):
+        keys.append(f"/lookup/id/ENSG{h:011d}")
+        if i % scan_every == 0:
+            for _ in range(scan_length):
+                keys.append(f"/variation/human/rs{scan_id}")
+                scan_id += 1
+    return keys
+
+
+def _hit_ratio(keys, cache):
+    hits = 0
+    for key in keys:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.put(key, True)
+    return hits / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", help="recorded trace to replay")
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200_000, help="synthetic trace length")
+    args = parser.parse_args()
+
+    if args.log:
+        keys = _read_trace(args.log)
+    else:
+        keys = _synthetic_trace(args.requests, hot_keys=20_000, scan_every=1000, scan_length=2000)
+
+    lru = _hit_ratio(keys, LRUCache(max_entries=args.capacity, max_bytes=0))
+    tinylfu = _hit_ratio(
+        keys, LRUCache(max_entries=args.capacity, max_bytes=0, admission=TinyLFU(capacity=args.capacity))
+    )
+    print(f"requests: {len(keys)}  capacity: {args.capacity}")
+    print(f"LRU            hit ratio {lru:.3f}")
+    print(f"LRU + TinyLFU  hit ratio {tinylfu:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Microbenchmark: cost of computing a cache key in _ensembl_get.
+
+Run from the project root:
+
+    python benchmarks/bench_cache_key.py
+
+Compares the original JSON + SHA-256 key with the tuple key now used in
+memory, and with the tuple key plus the BLAKE2b digest used for the shared
+disk tier (only paid on a memory miss).
+"""
+import hashlib
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.main import _cache_key, _stable_key  # noqa: E402
+
+
+def legacy_cache_key(path, params, release=None):
+    payload = json.dumps({"path": path, "params": params or {}, "release": release}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+CASES = [
+    ("no params", "/variation/homo_sapiens/rs699", None),
+    ("expand=1", "/lookup/id/ENSG00000139618", {"expand": 1}),
+    ("type=orthologues", "/homology/id/ENSG00000139618", {"type": "orthologues"}),
+]
+
+
+def main():
+    number = 200_000
+    print(f"{'case':<18} {'json+sha256':>12} {'tuple':>8} {'tuple lookup':>13} {'+blake2b':>9}  (ns/op)")
+    for label, path, params in CASES:
+        legacy = timeit.timeit(lambda: legacy_cache_key(path, params, 113), number=number)
+        tuple_key = timeit.timeit(lambda: _cache_key(path, params, 113), number=number)
+        cache = {_cache_key(path, params, 113): True}
+        lookup = timeit.timeit(lambda: cache.get(_cache_key(path, params, 113)), number=number)
+        stable = timeit.timeit(lambda: _stable_key(_cache_key(path, params, 113)), number=number)
+        print(
+            f"{label:<18} {legacy / number * 1e9:>12.0f} {tuple_key / number * 1e9:>8.0f} "
+            f"{lookup / number * 1e9:>13.0f} {stable / number * 1e9:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure how micro-batching single-ID lookups stretches Ensembl's rate limit.
+
+Run from the project root:
+
+    python benchmarks/bench_lookup_batching.py [--rps 500] [--seconds 2] [--latency-ms 50]
+
+Concurrent /ensembl/gene-annotation requests for distinct genes arrive at
+``--rps`` against a cold cache and a mocked Ensembl that answers every call
+after ``--latency-ms``. For each batching window the script reports how many
+upstream calls were made, how long those calls take to clear at Ensembl's
+documented limit of 15 requests per second, and the client-side latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+# count upstream calls against a mock, without client-side pacing
+os.environ.setdefault("ENSEMBL_RATE_LIMIT_PER_SECOND", "0")
+from app import main as service  # noqa: E402
+from app.cache import MicroBatcher  # noqa: E402
+
+ENSEMBL_REQUESTS_PER_SECOND = 15
+WINDOWS_MS = (0, 2, 5, 10, 25)
+
+
+def _payload(gene_id):
+    return {
+        "id": gene_id,
+        "display_name": gene_id,
+        "biotype": "protein_coding",
+        "seq_region_name": "13",
+        "start": 1,
+        "end": 1000,
+        "strand": 1,
+    }
+
+
+async def _run(window_ms, max_size, rps, seconds, latency):
+    upstream = []
+
+    async def handler(request):
+        upstream.append(request.method)
+        await asyncio.sleep(latency)
+        if request.method == "POST":
+            return httpx.Response(200, json={g: _payload(g) for g in json.loads(request.content)["ids"]})
+        return httpx.Response(200, json=_payload(request.url.path.rsplit("/", 1)[-1]))
+
+    service._init_cache_state()
+    service.app.state.retries = 1
+    service.app.state.http = httpx.AsyncClient(base_url=service.ENSEMBL_REST, transport=httpx.MockTransport(handler))
+    if window_ms:
+        service.app.state.lookup_batcher = MicroBatcher(service._lookup_batch, window_ms / 1000.0, max_size)
+
+    latencies = []
+
+    async def one(gene_id):
+        started = asyncio.get_running_loop().time()
+        await service.ensembl_gene_annotation(gene_id=gene_id)
+        latencies.append(asyncio.get_running_loop().time() - started)
+
+    tasks = []
+    for i in range(int(rps * seconds)):
+        tasks.append(asyncio.ensure_future(one(f"ENSG{i:011d}")))
+        await asyncio.sleep(1.0 / rps)
+    await asyncio.gather(*tasks)
+    await service.app.state.http.aclose()
+    return len(upstream), statistics.median(latencies), sorted(latencies)[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rps", type=float, default=500)
+    parser.add_argument("--seconds", type=float, default=2)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--max-size", type=int, default=service.DEFAULT_LOOKUP_BATCH_MAX_SIZE)
+    args = parser.parse_args()
+
+    print(f"{'window ms':>9} {'upstream':>9} {'at 15 req/s':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for window_ms in WINDOWS_MS:
+        calls, p50, p99 = asyncio.run(_run(window_ms, args.max_size, args.rps, args.seconds, args.latency_ms / 1000.0))
+        budget = calls / ENSEMBL_REQUESTS_PER_SECOND
+        print(f"{window_ms:>9} {calls:>9} {budget:>11.1f}s {p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Count upstream /lookup/id calls for typical client access patterns.
+
+Run from the project root:
+
+    python benchmarks/bench_lookup_sharing.py [--genes 200]
+
+Each pattern is replayed against a mocked Ensembl with a cold cache, once with
+ENSEMBL_LOOKUP_EXPAND_BY_DEFAULT off (annotation fetches the plain payload) and
+once with it on (annotation fetches and shares the expanded payload).
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+# count upstream calls against a mock, without client-side pacing
+os.environ.setdefault("ENSEMBL_RATE_LIMIT_PER_SECOND", "0")
+from app import main as service  # noqa: E402
+
+
+def _payload(gene_id):
+    return {
+        "id": gene_id,
+        "display_name": gene_id,
+        "biotype": "protein_coding",
+        "seq_region_name": "13",
+        "start": 1,
+        "end": 1000,
+        "strand": 1,
+        "Transcript": [{"id": f"{gene_id}-T{i}", "biotype": "protein_coding", "start": 1, "end": 10, "strand": 1}
+                       for i in range(5)],
+    }
+
+
+PATTERNS = {
+    "annotation only": lambda g: [("annotation", g)],
+    "transcripts only": lambda g: [("transcripts", g)],
+    "annotation then transcripts": lambda g: [("annotation", g), ("transcripts", g)],
+    "transcripts then annotation": lambda g: [("transcripts", g), ("annotation", g)],
+}
+
+
+async def _replay(calls, expand):
+    upstream = []
+
+    async def handler(request):
+        upstream.append(request.url.path)
+        return httpx.Response(200, json=_payload(request.url.path.rsplit("/", 1)[-1]))
+
+    service._init_cache_state()
+    service.app.state.retries = 1
+    service.app.state.lookup_expand = expand
+    service.app.state.http = httpx.AsyncClient(base_url=service.ENSEMBL_REST, transport=httpx.MockTransport(handler))
+    for endpoint, gene_id in calls:
+        if endpoint == "annotation":
+            await service.ensembl_gene_annotation(gene_id=gene_id)
+        else:
+            await service.ensembl_gene_transcripts(species="human", gene_id=gene_id)
+    await service.app.state.http.aclose()
+    return len(upstream)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--genes", type=int, default=200)
+    args = parser.parse_args()
+    genes = [f"ENSG{i:011d}" for i in range(args.genes)]
+
+    print(f"{'pattern':<30} {'plain':>8} {'expanded':>9}")
+    for name, pattern in PATTERNS.items():
+        calls = [call for g in genes for call in pattern(g)]
+        plain = asyncio.run(_replay(calls, expand=False))
+        shared = asyncio.run(_replay(calls, expand=True))
+        print(f"{name:<30} {plain:>8} {shared:>9}")
+
+
+if __name__ == "__main__":
+    main()
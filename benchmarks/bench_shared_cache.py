@@ -0,0 +1,91 @@
+"""Compare lookup cost of the per-process cache against the shared SQLite tier.
+
+Run from the project root:
+
+    python benchmarks/bench_shared_cache.py [--workers 8] [--keys 2000] [--reads 20000]
+
+Single-process numbers show the raw per-lookup overhead; the multi-process run
+has every worker read (and occasionally rewrite) the same file at once, which
+is what `uvicorn app.main:app --workers N` does with ENSEMBL_DISK_CACHE_DIR set.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app.cache import DiskCache, LRUCache  # noqa: E402
+
+
+BODY = b'{"id": "ENSG00000139618", "display_name": "BRCA2", "biotype": "protein_coding"}' * 20
+
+
+def _timed(label, fn, n):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed / n * 1e6:8.2f} us/op")
+
+
+def _worker(path, keys, reads, write_every, out):
+    disk = DiskCache(path)
+    rng = random.Random(os.getpid())
+    start = time.perf_counter()
+    for i in range(reads):
+        key = f"k{rng.randrange(keys)}"
+        if write_every and i % write_every == 0:
+            disk.put(key, BODY, time.time() + 60)
+        else:
+            disk.get(key)
+    out.put(time.perf_counter() - start)
+    disk.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--keys", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--write-every", type=int, default=50, help="one write per N ops per worker (0 = read only)")
+    args = parser.parse_args()
+
+    keys = [f"k{i}" for i in range(args.keys)]
+    lookups = [random.choice(keys) for _ in range(args.reads)]
+
+    plain = {k: {"data": BODY, "expires_at": 0.0} for k in keys}
+    _timed("dict (baseline)", lambda: [plain.get(k) for k in lookups], args.reads)
+
+    lru = LRUCache(max_entries=0, max_bytes=0)
+    for k in keys:
+        lru.put(k, {"data": BODY, "expires_at": 0.0}, size=len(BODY))
+    _timed("LRUCache", lambda: [lru.get(k) for k in lookups], args.reads)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        disk = DiskCache(path)
+        for k in keys:
+            disk.put(k, BODY, time.time() + 60)
+        _timed("DiskCache (1 process)", lambda: [disk.get(k) for k in lookups], args.reads)
+        disk.close()
+
+        out = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=_worker, args=(path, args.keys, args.reads, args.write_every, out))
+            for _ in range(args.workers)
+        ]
+        for p in procs:
+            p.start()
+        durations = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+        per_op = max(durations) / args.reads * 1e6
+        label = f"DiskCache ({args.workers} processes)"
+        print(f"{label:<32} {per_op:8.2f} us/op (slowest worker)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
+import asyncio
 import json
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 
+from app.cache import DiskCache, LRUCache, TinyLFU, get_codec
 from app.main import app
 
 
@@ -96,3 +104,751 @@ def test_orthologs(monkeypatch):
     assert data["valid"] is True
 
 
+
+
+def _use_upstream(handler):
+    """Point app.state at a mocked Ensembl transport (no startup event needed)."""
+    from app import main
+
+    main._init_cache_state()
+    main.app.state.retries = 1
+    main.app.state.http = httpx.AsyncClient(
+        base_url=main.ENSEMBL_REST, transport=httpx.MockTransport(handler)
+    )
+    return main
+
+
+def test_concurrent_misses_are_coalesced():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"id": "ENSG00000139618"})
+
+    main = _use_upstream(handler)
+
+    async def run():
+        return await asyncio.gather(*[main._ensembl_get("/lookup/id/ENSG00000139618") for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert calls == ["/lookup/id/ENSG00000139618"]
+    assert all(r == {"id": "ENSG00000139618"} for r in results)
+    assert main.app.state.inflight.coalesced == 4
+
+
+def test_coalesced_callers_all_see_upstream_error():
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(404, text="not found")
+
+    main = _use_upstream(handler)
+
+    async def run():
+        return await asyncio.gather(
+            *[main._ensembl_get("/lookup/id/ENSGX") for _ in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, HTTPException) and r.status_code == 404 for r in results)
+
+
+def test_stale_entry_served_while_refreshing():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"version": 2})
+
+    main = _use_upstream(handler)
+    main.app.state.cache_max_stale = 60.0
+
+    async def run():
+        key = main._cache_key("/lookup/id/ENSGX", None)
+        expired = asyncio.get_event_loop().time() - 1
+        main.app.state.cache.put(key, {"data": {"version": 1}, "expires_at": expired})
+        first = await main._ensembl_get("/lookup/id/ENSGX")
+        second = await main._ensembl_get("/lookup/id/ENSGX")  # refresh still in flight
+        await asyncio.sleep(0.01)
+        third = await main._ensembl_get("/lookup/id/ENSGX")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == second == {"version": 1}
+    assert third == {"version": 2}
+    assert calls == ["/lookup/id/ENSGX"]
+    assert main.app.state.counters["stale_served"] == 2
+
+
+def test_expensive_entry_is_refreshed_before_it_expires(monkeypatch):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"version": 2})
+
+    main = _use_upstream(handler)
+    main.app.state.xfetch_beta = 1.0
+    # -ln(0.5) * 1000s of fetch cost is far past the 5s left, so the refresh is certain
+    monkeypatch.setattr(main.random, "random", lambda: 0.5)
+
+    async def run():
+        key = main._cache_key("/lookup/id/ENSGX", None)
+        cheap_key = main._cache_key("/lookup/id/ENSGY", None)
+        expires = asyncio.get_event_loop().time() + 5
+        main.app.state.cache.put(key, {"data": {"version": 1}, "expires_at": expires, "fetch_seconds": 1000.0})
+        main.app.state.cache.put(cheap_key, {"data": {"version": 1}, "expires_at": expires, "fetch_seconds": 0.0})
+        first = await main._ensembl_get("/lookup/id/ENSGX")
+        cheap = await main._ensembl_get("/lookup/id/ENSGY")
+        await asyncio.sleep(0.01)
+        second = await main._ensembl_get("/lookup/id/ENSGX")
+        return first, cheap, second
+
+    first, cheap, second = asyncio.run(run())
+    assert first == cheap == {"version": 1}
+    assert second == {"version": 2}
+    assert calls == ["/lookup/id/ENSGX"]
+    assert main.app.state.prefix_counters["/lookup/id"]["early_refreshes"] == 1
+
+
+def test_rate_limited_request_is_retried_after_retry_after():
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0.05"}, text="slow down"),
+        httpx.Response(200, json={"id": "ENSGX"}, headers={"X-RateLimit-Remaining": "500", "X-RateLimit-Reset": "100"}),
+    ]
+
+    async def handler(request):
+        return responses.pop(0)
+
+    main = _use_upstream(handler)
+    data = asyncio.run(main._ensembl_get("/lookup/id/ENSGX"))
+    assert data == {"id": "ENSGX"}
+    assert len(main.app.state.negative_cache) == 0
+    stats = client.get("/admin/upstream/stats").json()
+    assert stats["rate_limit_retries"] == 1
+    assert stats["rate_limit"]["rate_limited"] == 1 and stats["rate_limit"]["remaining"] == 500
+
+
+def test_long_rate_limit_block_fails_fast_with_503():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(429, headers={"Retry-After": "3600"}, text="slow down")
+
+    main = _use_upstream(handler)
+    main.app.state.rate_limiter = main.RateLimiter(0.0, max_wait=1.0)
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(HTTPException) as info:
+            await main._ensembl_get("/lookup/id/ENSGX")
+        return info.value, time.monotonic() - started
+
+    exc, elapsed = asyncio.run(run())
+    assert elapsed < 0.5 and len(calls) == 1
+    assert exc.status_code == 503 and exc.headers["Retry-After"] == "3600"
+    stats = client.get("/admin/upstream/stats").json()
+    assert stats["rate_limit_rejections"] == 1 and stats["rate_limit"]["rejected"] == 1
+
+
+def test_upstream_calls_over_the_concurrency_limit_get_503():
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, json={"id": request.url.path})
+
+    main = _use_upstream(handler)
+    main.app.state.concurrency_limiter = main.ConcurrencyLimiter(initial=1, min_limit=1, max_limit=1, max_wait=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            main._ensembl_get("/lookup/id/ENSG1"), main._ensembl_get("/lookup/id/ENSG2"), return_exceptions=True
+        )
+
+    first, second = asyncio.run(run())
+    assert first == {"id": "/lookup/id/ENSG1"}
+    assert isinstance(second, HTTPException) and second.status_code == 503
+    stats = client.get("/admin/upstream/stats").json()["concurrency"]
+    assert stats["rejected"] == 1 and stats["in_flight"] == 0
+
+
+def test_client_errors_are_negatively_cached():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(400, text="No variant found for rs69900000000")
+
+    main = _use_upstream(handler)
+
+    async def run():
+        errors = []
+        for _ in range(3):
+            try:
+                await main._ensembl_get("/variation/human/rs69900000000")
+            except HTTPException as exc:
+                errors.append(exc)
+        return errors
+
+    errors = asyncio.run(run())
+    assert len(calls) == 1
+    assert [e.status_code for e in errors] == [400, 400, 400]
+    assert errors[-1].detail == "No variant found for rs69900000000"
+    assert main.app.state.counters["negative_hits"] == 2
+    assert main.app.state.counters["hits"] == 0
+
+
+def test_memory_miss_is_served_from_disk_tier(tmp_path):
+    async def handler(request):  # pragma: no cover - must not be called
+        raise AssertionError("upstream should not be hit")
+
+    main = _use_upstream(handler)
+    main.app.state.disk_cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    key = main._cache_key("/lookup/id/ENSGX", None)
+    main.app.state.disk_cache.put(main._stable_key(key), b'{"id": "ENSGX"}', time.time() + 60)
+
+    data = asyncio.run(main._ensembl_get("/lookup/id/ENSGX"))
+    assert data == {"id": "ENSGX"}
+    assert key in main.app.state.cache
+    assert main.app.state.counters["disk_hits"] == 1
+
+
+def test_repeated_orthologs_validation_is_memoized(monkeypatch):
+    from app import main
+
+    async def fake_get(path, params=None):
+        target = {"id": "X", "species": "mouse", "perc_id": 80.0, "perc_pos": 90.0}
+        return {"data": [{"homologies": [{"type": "ortholog_one2one", "target": target}]}]}
+
+    main._init_cache_state()
+    monkeypatch.setattr("app.main._ensembl_get", fake_get)
+    normalize_calls = []
+    real_normalize = main.pd.json_normalize
+    monkeypatch.setattr(main.pd, "json_normalize", lambda *a, **k: normalize_calls.append(1) or real_normalize(*a, **k))
+
+    first = client.get("/ensembl/orthologs", params={"gene_id": "ENSGX"}).json()
+    second = client.get("/ensembl/orthologs", params={"gene_id": "ENSGX"}).json()
+    assert first == second and first["valid"] is True
+    assert len(normalize_calls) == 1
+    assert main.app.state.counters["validation_hits"] == 1
+    # a different filter is a different result
+    client.get("/ensembl/orthologs", params={"gene_id": "ENSGX", "target_species": "mouse"})
+    assert len(normalize_calls) == 2
+
+
+def test_validation_memo_reuses_digest_stored_with_the_entry(monkeypatch):
+    body = {"data": [{"homologies": [{"type": "ortholog_one2one",
+                                      "target": {"id": "X", "species": "mouse", "perc_id": 80.0, "perc_pos": 90.0}}]}]}
+
+    async def handler(request):
+        return httpx.Response(200, json=body)
+
+    main = _use_upstream(handler)
+    main.app.state.cache_codec = get_codec("zlib")
+    first = client.get("/ensembl/orthologs", params={"gene_id": "ENSGX"}).json()
+    # warm hits (even decompressed ones) must not re-serialise and hash the payload,
+    # nor re-hash the schema definition
+    hashed = []
+    real_sha256 = main.hashlib.sha256
+    monkeypatch.setattr(main.hashlib, "sha256", lambda data=b"": hashed.append(data) or real_sha256(data))
+    second = client.get("/ensembl/orthologs", params={"gene_id": "ENSGX"}).json()
+    assert hashed == []
+    assert first == second and first["valid"] is True
+    assert main.app.state.counters["validation_hits"] == 1
+
+
+def test_compressed_entries_are_decoded_on_access():
+    payload = {"id": "ENSGX", "Transcript": [{"id": f"ENST{i:011d}", "biotype": "protein_coding"} for i in range(200)]}
+
+    async def handler(request):
+        return httpx.Response(200, json=payload)
+
+    main = _use_upstream(handler)
+    main.app.state.cache_codec = get_codec("zlib")
+
+    async def run():
+        await main._ensembl_get("/lookup/id/ENSGX", {"expand": 1})
+        return await main._ensembl_get("/lookup/id/ENSGX", {"expand": 1})
+
+    assert asyncio.run(run()) == payload
+    entry = main.app.state.cache.peek(main._cache_key("/lookup/id/ENSGX", {"expand": 1}))
+    assert "data" not in entry
+    assert entry["stored_size"] < entry["raw_size"] / 4
+    assert main.app.state.cache.bytes == entry["stored_size"]
+
+
+def test_decoded_entries_are_charged_their_in_memory_size():
+    payload = {"id": "ENSGX", "Transcript": [{"id": f"ENST{i:011d}", "biotype": "protein_coding"} for i in range(200)]}
+
+    async def handler(request):
+        return httpx.Response(200, json=payload)
+
+    main = _use_upstream(handler)
+    asyncio.run(main._ensembl_get("/lookup/id/ENSGX"))
+    entry = main.app.state.cache.peek(main._cache_key("/lookup/id/ENSGX", None))
+    assert "data" in entry
+    assert entry["stored_size"] == int(entry["raw_size"] * main.DEFAULT_CACHE_DECODED_SIZE_FACTOR)
+    assert main.app.state.cache.bytes == entry["stored_size"]
+
+
+def test_expired_entry_is_revalidated_with_etag():
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"r113"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"id": "ENSGX"}, headers={"ETag": '"r113"'})
+
+    main = _use_upstream(handler)
+
+    async def run():
+        first = await main._ensembl_get("/lookup/id/ENSGX")
+        key = main._cache_key("/lookup/id/ENSGX", None)
+        main.app.state.cache.peek(key)["expires_at"] = 0.0  # force expiry
+        second = await main._ensembl_get("/lookup/id/ENSGX")
+        third = await main._ensembl_get("/lookup/id/ENSGX")  # fresh again after the 304
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == second == third == {"id": "ENSGX"}
+    assert seen == [None, '"r113"']
+    assert main.app.state.counters["not_modified"] == 1
+    assert main.app.state.counters["revalidation_bytes_saved"] > 0
+
+
+def test_admin_cache_stats_and_purge():
+    async def handler(request):
+        return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1]})
+
+    main = _use_upstream(handler)
+
+    async def run():
+        await main._ensembl_get("/lookup/id/ENSG1")
+        await main._ensembl_get("/lookup/id/ENSG1")
+        await main._ensembl_get("/lookup/id/ENSG2")
+        await main._ensembl_get("/variation/human/rs699")
+
+    asyncio.run(run())
+    stats = client.get("/admin/cache/stats").json()
+    assert stats["entries"] == 3
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["prefixes"]["/lookup/id"]["entries"] == 2
+    assert stats["prefixes"]["/lookup/id"]["hits"] == 1
+    assert stats["prefixes"]["/variation"]["misses"] == 1
+
+    assert client.post("/admin/cache/purge", params={"key": "/lookup/id/ENSG1"}).json()["purged"] == 1
+    assert client.post("/admin/cache/purge", params={"prefix": "/variation"}).json()["purged"] == 1
+    assert client.post("/admin/cache/purge").status_code == 400
+    assert client.get("/admin/cache/stats").json()["prefixes"]["/lookup/id"]["entries"] == 1
+
+
+def test_purge_removes_disk_rows_not_held_in_memory(tmp_path):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1]})
+
+    main = _use_upstream(handler)
+    main.app.state.disk_cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    # another worker's rows: on disk, never in this worker's memory
+    other = DiskCache(str(tmp_path / "cache.sqlite3"))
+    for path in ("/lookup/id/ENSG1", "/lookup/id/ENSG2", "/variation/homo_sapiens/rs699"):
+        other.put(main._stable_key(main._cache_key(path, None)), b'{"id": "old"}', time.time() + 60, path)
+
+    assert client.post("/admin/cache/purge", params={"key": "/lookup/id/ENSG1"}).json()["disk_purged"] == 1
+    assert client.post("/admin/cache/purge", params={"prefix": "/variation"}).json()["disk_purged"] == 1
+    assert asyncio.run(main._ensembl_get("/lookup/id/ENSG1")) == {"id": "ENSG1"}
+    assert asyncio.run(main._ensembl_get("/lookup/id/ENSG2")) == {"id": "old"}
+    assert asyncio.run(main._ensembl_get("/variation/homo_sapiens/rs699")) == {"id": "rs699"}
+    assert calls == ["/lookup/id/ENSG1", "/variation/homo_sapiens/rs699"]
+
+
+def test_cache_stats_do_not_block_the_loop_during_disk_work(tmp_path):
+    main = _use_upstream(None)
+    main.app.state.disk_cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def run():
+        # stand-in for a long compaction in a worker thread
+        main.app.state.disk_cache._lock.acquire()
+        threading.Timer(0.2, main.app.state.disk_cache._lock.release).start()
+        started = time.monotonic()
+        stats, _ = await asyncio.gather(main.admin_cache_stats(), ticker())
+        return stats, started
+
+    stats, started = asyncio.run(run())
+    assert stats["disk"]["bytes"] == 0
+    assert len(ticks) == 5 and ticks[-1] - started < 0.15
+
+
+def test_warmup_fetches_watchlist_and_sets_ready(tmp_path):
+    fetched = []
+
+    async def handler(request):
+        fetched.append(request.url.path)
+        if request.url.path.endswith("ENSGBAD"):
+            return httpx.Response(404, text="not found")
+        if request.url.path.endswith("ENSGHTML"):
+            return httpx.Response(200, text="<html>down for maintenance</html>")
+        if request.url.path.endswith("ENSGDROP"):
+            raise httpx.RemoteProtocolError("server disconnected")
+        return httpx.Response(200, json={})
+
+    watchlist = tmp_path / "watchlist.txt"
+    watchlist.write_text("# top genes\nENSGHTML\nENSGDROP\nENSG00000139618\nrs699\n\nENSGBAD\n")
+    main = _use_upstream(handler)
+    main.app.state.ready = False
+
+    asyncio.run(main._warm_cache(str(watchlist), concurrency=2))
+    assert main.app.state.ready is True
+    # a bad ID does not end the warm-up for the ones after it
+    assert "/variation/homo_sapiens/rs699" in fetched  # species alias canonicalised
+    assert fetched.count("/lookup/id/ENSG00000139618") == 1  # expanded form serves both endpoints
+    assert "/homology/id/ENSG00000139618" in fetched
+    assert client.get("/ready").status_code == 200
+
+
+def test_release_change_flushes_cache_generation():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        if request.url.path == "/info/data":
+            return httpx.Response(200, json={"releases": [113]})
+        return httpx.Response(200, json={"id": "ENSGX"})
+
+    main = _use_upstream(handler)
+
+    async def run():
+        await main._ensembl_get("/lookup/id/ENSGX")
+        await main._refresh_release()
+        assert main.app.state.release == 113
+        assert len(main.app.state.cache) == 0
+        await main._ensembl_get("/lookup/id/ENSGX")
+        entry = main.app.state.cache.peek(main._cache_key("/lookup/id/ENSGX", None, 113))
+        return entry["expires_at"] - asyncio.get_event_loop().time()
+
+    remaining = asyncio.run(run())
+    assert remaining > main.DEFAULT_CACHE_TTL_SECONDS
+    assert calls.count("/lookup/id/ENSGX") == 2
+    assert main.app.state.cache_generation == 1
+
+
+def test_release_polling_survives_malformed_info_data():
+    bodies = [[113], {"releases": [None]}, {"releases": [114]}]
+
+    async def handler(request):
+        return httpx.Response(200, json=bodies.pop(0))
+
+    main = _use_upstream(handler)
+
+    async def run():
+        poller = asyncio.ensure_future(main._poll_release(0.01))
+        await asyncio.sleep(0.1)
+        alive = not poller.done()
+        poller.cancel()
+        return alive
+
+    assert asyncio.run(run())
+    assert main.app.state.release == 114
+
+
+def test_gene_annotation_reuses_expanded_lookup():
+    calls = []
+
+    async def handler(request):
+        calls.append((request.url.path, dict(request.url.params)))
+        return httpx.Response(200, json={
+            "id": "ENSG00000139618",
+            "display_name": "BRCA2",
+            "biotype": "protein_coding",
+            "seq_region_name": "13",
+            "start": 32315474,
+            "end": 32400266,
+            "strand": 1,
+            "Transcript": [{"id": "ENST0001", "biotype": "protein_coding", "start": 1, "end": 10, "strand": 1}],
+        })
+
+    _use_upstream(handler)
+    transcripts = client.get("/ensembl/gene-transcripts", params={"species": "human", "gene_id": "ENSG00000139618"})
+    annotation = client.get("/ensembl/gene-annotation", params={"gene_id": "ENSG00000139618"})
+    assert transcripts.json()["num_rows"] == 1
+    assert annotation.json()["valid"] is True
+    assert annotation.json()["num_rows"] == 1
+    assert calls == [("/lookup/id/ENSG00000139618", {"expand": "1"})]
+
+
+def test_annotation_hits_on_expanded_entry_keep_it_recent():
+    calls = []
+
+    async def handler(request):
+        gene_id = request.url.path.rsplit("/", 1)[-1]
+        calls.append(gene_id)
+        return httpx.Response(200, json={"id": gene_id, "start": 1, "end": 10, "strand": 1,
+                                         "Transcript": [{"id": "T", "biotype": "x", "start": 1, "end": 2, "strand": 1}]})
+
+    main = _use_upstream(handler)
+    main.app.state.lookup_expand = False
+    main.app.state.cache = LRUCache(max_entries=3, max_bytes=0)
+    client.get("/ensembl/gene-transcripts", params={"species": "human", "gene_id": "ENSGA"})
+    for other in ("ENSGB", "ENSGC", "ENSGD"):
+        client.get("/ensembl/gene-annotation", params={"gene_id": "ENSGA"})
+        client.get("/ensembl/gene-annotation", params={"gene_id": other})
+    assert calls == ["ENSGA", "ENSGB", "ENSGC", "ENSGD"]  # ENSGB was evicted, not the hot ENSGA
+    assert main.app.state.cache.hits == 3
+
+
+def test_gene_annotation_batch_fetches_only_misses():
+    calls = []
+
+    def gene(gene_id, start):
+        return {"id": gene_id, "display_name": gene_id, "biotype": "protein_coding",
+                "seq_region_name": "1", "start": start, "end": 1000, "strand": 1}
+
+    async def handler(request):
+        ids = json.loads(request.content)["ids"]
+        calls.append((request.method, request.url.path, dict(request.url.params), ids))
+        return httpx.Response(200, json={
+            "ENSG00000000002": gene("ENSG00000000002", 100),
+            "ENSG00000000003": gene("ENSG00000000003", "not-a-number"),
+            "ENSG00000000004": None,
+        })
+
+    main = _use_upstream(handler)
+    cached = gene("ENSG00000000001", 1)
+    key = main._cache_key("/lookup/id/ENSG00000000001", main._EXPANDED_LOOKUP_PARAMS)
+    main.app.state.cache.put(key, {"data": cached, "expires_at": time.monotonic() + 60})
+
+    ids = ["ENSG00000000001", "ENSG00000000002.5", "ENSG00000000003", "ENSG00000000004"]
+    resp = client.post("/ensembl/gene-annotation/batch", json={"gene_ids": ids})
+    assert resp.status_code == 200
+    body = resp.json()
+    # the cached expanded entry is reused, but misses are not fetched expanded
+    assert calls == [("POST", "/lookup/id", {}, ["ENSG00000000002", "ENSG00000000003", "ENSG00000000004"])]
+    assert body["fetched"] == 3 and body["num_rows"] == 3
+    results = {r["gene_id"]: r for r in body["results"]}
+    assert results["ENSG00000000001"]["valid"] is True
+    assert results["ENSG00000000002.5"]["valid"] is True
+    assert results["ENSG00000000003"]["valid"] is False
+    assert results["ENSG00000000004"]["found"] is False
+    # fetched genes are cached individually, so the single endpoint is served without a call
+    single = client.get("/ensembl/gene-annotation", params={"gene_id": "ENSG00000000002"})
+    assert single.json()["valid"] is True
+    assert len(calls) == 1
+
+
+def test_batch_misses_count_towards_tinylfu_admission():
+    calls = []
+
+    async def handler(request):
+        ids = json.loads(request.content)["ids"]
+        calls.append(ids)
+        return httpx.Response(200, json={gene_id: {"id": gene_id} for gene_id in ids})
+
+    main = _use_upstream(handler)
+    # a full cache of entries nobody has asked for
+    main.app.state.cache = LRUCache(max_entries=3, max_bytes=0, admission=TinyLFU(capacity=1000))
+    for i in range(3):
+        main.app.state.cache.put(("cold", i), {"data": {}, "expires_at": time.monotonic() + 60})
+
+    ids = ["ENSG00000000001", "ENSG00000000002", "ENSG00000000003"]
+    for _ in range(2):
+        found, _fetched = asyncio.run(main._lookup_many(ids))
+        assert set(found) == set(ids)
+    assert len(calls) == 1
+    assert main.app.state.cache.rejections == 0
+
+
+def test_variation_batch_chunks_misses_and_reports_per_variant():
+    calls = []
+
+    def variant(name, freq, start):
+        mapping = {"seq_region_name": "1", "start": start, "end": 10, "strand": 1, "allele_string": "A/T"}
+        return {"name": name, "most_severe_consequence": "missense_variant", "minor_allele": "T",
+                "minor_allele_freq": freq, "mappings": [mapping, dict(mapping, seq_region_name="X")]}
+
+    async def handler(request):
+        ids = json.loads(request.content)["ids"]
+        calls.append((request.url.path, ids))
+        return httpx.Response(200, json={
+            vid: variant(vid, 1.5 if vid == "rs3" else 0.1, "bad" if vid == "rs4" else 5) for vid in ids if vid != "rs5"
+        })
+
+    main = _use_upstream(handler)
+    main.VARIATION_BATCH_SIZE, size = 2, main.VARIATION_BATCH_SIZE
+    try:
+        key = main._cache_key("/variation/homo_sapiens/rs1", None)
+        main.app.state.cache.put(key, {"data": variant("rs1", 0.2, 5), "expires_at": time.monotonic() + 60})
+        resp = client.post("/ensembl/variation/batch", params={"species": "human"},
+                           json={"variant_ids": ["rs1", "RS2", "rs3", "rs4", "rs5"]})
+    finally:
+        main.VARIATION_BATCH_SIZE = size
+    assert resp.status_code == 200
+    body = resp.json()
+    assert sorted(calls) == [("/variation/homo_sapiens", ["rs2", "rs3"]), ("/variation/homo_sapiens", ["rs4", "rs5"])]
+    assert body["fetched"] == 4
+    assert body["summary"]["num_rows"] == 4 and body["mappings"]["num_rows"] == 8
+    results = {r["variant_id"]: r for r in body["results"]}
+    assert results["rs1"]["valid"] and results["RS2"]["valid"]
+    assert results["rs3"]["summary_errors"] and not results["rs3"]["mappings_errors"]
+    assert results["rs4"]["mappings_errors"] and not results["rs4"]["summary_errors"]
+    assert results["rs5"]["found"] is False
+    assert body["valid"] is False
+
+
+def test_concurrent_lookup_misses_are_micro_batched():
+    calls = []
+
+    async def handler(request):
+        calls.append((request.method, request.url.path, json.loads(request.content)["ids"], dict(request.url.params)))
+        return httpx.Response(200, json={"ENSG1": {"id": "ENSG1"}, "ENSG2": {"id": "ENSG2"}, "ENSG3": None})
+
+    main = _use_upstream(handler)
+    main.app.state.lookup_batcher = main.MicroBatcher(main._lookup_batch, window=0.01, max_size=10)
+
+    async def run():
+        return await asyncio.gather(
+            *(main._ensembl_get(f"/lookup/id/{gene_id}", params={"expand": 1}) for gene_id in ("ENSG1", "ENSG2", "ENSG3")),
+            return_exceptions=True,
+        )
+
+    first, second, missing = asyncio.run(run())
+    assert first == {"id": "ENSG1"} and second == {"id": "ENSG2"}
+    assert isinstance(missing, HTTPException) and missing.status_code == 404
+    assert calls == [("POST", "/lookup/id", ["ENSG1", "ENSG2", "ENSG3"], {"expand": "1"})]
+    # results are cached per ID, and the unknown one negatively
+    assert asyncio.run(main._ensembl_get("/lookup/id/ENSG2", params={"expand": 1})) == {"id": "ENSG2"}
+    assert len(main.app.state.negative_cache) == 1
+    assert len(calls) == 1
+
+
+def test_normalized_tables_are_reused_for_identical_payloads(monkeypatch):
+    from app import main
+
+    async def fake_get(path, params=None):
+        return {
+            "name": "rs699",
+            "most_severe_consequence": "missense_variant",
+            "mappings": [{"seq_region_name": "1", "start": 1, "end": 1, "strand": 1, "allele_string": "A/G"}],
+        }
+
+    main._init_cache_state()
+    main.app.state.table_cache = LRUCache(max_entries=100, max_bytes=1024 * 1024)
+    monkeypatch.setattr("app.main._ensembl_get", fake_get)
+    normalize_calls = []
+    real_normalize = main.pd.json_normalize
+    monkeypatch.setattr(main.pd, "json_normalize", lambda *a, **k: normalize_calls.append(1) or real_normalize(*a, **k))
+
+    first = client.get("/ensembl/variation", params={"species": "human", "variant_id": "rs699"}).json()
+    second = client.get("/ensembl/variation", params={"species": "human", "variant_id": "rs699"}).json()
+    assert first == second
+    assert len(normalize_calls) == 2  # summary + mappings, built once
+    assert main.app.state.counters["table_hits"] == 2
+    assert main.app.state.table_cache.bytes > 0
+
+
+def test_table_cache_hits_reuse_the_stored_digest(monkeypatch):
+    gene = {"id": "ENSGX", "display_name": "X", "biotype": "protein_coding", "seq_region_name": "1",
+            "start": 1, "end": 10, "strand": 1}
+    variant = {"name": "rs699", "mappings": [{"seq_region_name": "1", "start": 1, "end": 1, "strand": 1,
+                                              "allele_string": "A/G"}]}
+
+    async def handler(request):
+        if request.url.path.startswith("/variation"):
+            return httpx.Response(200, json=variant)
+        return httpx.Response(200, json=dict(gene, Transcript=[{"id": "T"}]))
+
+    main = _use_upstream(handler)
+    main.app.state.table_cache = LRUCache(max_entries=100, max_bytes=1024 * 1024)
+    client.get("/ensembl/gene-annotation", params={"gene_id": "ENSGX"})
+    client.get("/ensembl/variation", params={"species": "human", "variant_id": "rs699"})
+    hashed = []
+    real_sha256 = main.hashlib.sha256
+    monkeypatch.setattr(main.hashlib, "sha256", lambda data=b"": hashed.append(data) or real_sha256(data))
+    assert client.get("/ensembl/gene-annotation", params={"gene_id": "ENSGX"}).json()["valid"] is True
+    client.get("/ensembl/variation", params={"species": "human", "variant_id": "rs699"})
+    assert main.app.state.counters["table_hits"] == 3  # gene + variant summary + mappings
+    assert json.dumps(gene, separators=(",", ":")).encode() not in hashed
+    assert json.dumps(variant, separators=(",", ":")).encode() not in hashed
+
+
+def test_cache_snapshot_export_and_import(monkeypatch):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1]}, headers={"ETag": '"v1"'})
+
+    main = _use_upstream(handler)
+
+    async def warm():
+        for gene in ("ENSG1", "ENSG2"):
+            await main._ensembl_get(f"/lookup/id/{gene}", {"expand": 1})
+
+    asyncio.run(warm())
+    snapshot = client.get("/admin/cache/export").content
+
+    main._init_cache_state()  # a fresh node
+    # disabled unless a token is configured, and the token is then required
+    assert client.post("/admin/cache/import", content=snapshot).status_code == 403
+    monkeypatch.setattr(main, "CACHE_IMPORT_TOKEN", "s3cret")
+    assert client.post("/admin/cache/import", content=snapshot).status_code == 401
+    assert client.post("/admin/cache/import", content=snapshot, headers={"Authorization": "Bearer nope"}).status_code == 401
+    assert len(main.app.state.cache) == 0
+    auth = {"Authorization": "Bearer s3cret"}
+    assert client.post("/admin/cache/import", content=snapshot, headers=auth).json() == {"imported": 2, "skipped": 0}
+    assert asyncio.run(main._ensembl_get("/lookup/id/ENSG2", {"expand": 1})) == {"id": "ENSG2"}
+    assert calls == ["/lookup/id/ENSG1", "/lookup/id/ENSG2"]
+    entry = main.app.state.cache.peek(main._cache_key("/lookup/id/ENSG2", {"expand": 1}))
+    assert entry["etag"] == '"v1"'
+    assert client.post("/admin/cache/import", content=b"garbage", headers=auth).status_code == 400
+
+
+def test_sweeper_reclaims_expired_entries():
+    async def handler(request):
+        return httpx.Response(200, json={"id": "ENSGX"})
+
+    main = _use_upstream(handler)
+    main.app.state.cache_ttl = 0.0
+    main.app.state.sweep_grace = 0.0
+
+    async def run():
+        await main._ensembl_get("/lookup/id/ENSGX")
+        assert len(main.app.state.cache) == 1
+        sweeper = asyncio.create_task(main._sweep_expired(0.01))
+        await asyncio.sleep(0.05)
+        sweeper.cancel()
+
+    asyncio.run(run())
+    assert len(main.app.state.cache) == 0
+    assert main.app.state.counters["swept"] == 1
+
+
+def test_equivalent_requests_share_one_canonical_entry():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"ok": True})
+
+    main = _use_upstream(handler)
+
+    async def run():
+        await main._ensembl_get("/variation/homo_sapiens/rs699")
+        await main._ensembl_get("/variation/human/RS699")
+        await main._ensembl_get("/lookup/id/ENSG00000139618", {"expand": 1})
+        await main._ensembl_get("/lookup/id/ENSG00000139618.17", {"expand": 1})
+
+    asyncio.run(run())
+    assert calls == ["/variation/homo_sapiens/rs699", "/lookup/id/ENSG00000139618"]
+    stats = client.get("/admin/cache/stats").json()
+    assert stats["counters"]["canonical_hits"] == 2
+    assert stats["hit_ratio"] == 0.5
+    assert stats["hit_ratio_without_canonicalization"] == 0.0
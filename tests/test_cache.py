@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import pytest
+
+from app.cache import (
+    SNAPSHOT_MAGIC,
+    DiskCache,
+    LRUCache,
+    MicroBatcher,
+    TinyLFU,
+    get_codec,
+    pack_snapshot_record,
+    read_snapshot,
+)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, max_bytes=0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recent
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_lru_respects_byte_budget():
+    cache = LRUCache(max_entries=0, max_bytes=100)
+    cache.put("a", "x", size=60)
+    cache.put("b", "y", size=60)
+    assert len(cache) == 1 and "b" in cache
+    assert cache.bytes == 60
+    # an entry bigger than the whole budget is refused outright
+    assert cache.put("huge", "z", size=101) is False
+    assert "b" in cache
+
+
+def test_disk_cache_roundtrip_and_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    disk = DiskCache(path)
+    disk.put("k", b'{"id": "ENSG00000139618"}', time.time() + 60)
+    disk.close()
+
+    reopened = DiskCache(path)
+    body, expires_at = reopened.get("k")
+    assert body == b'{"id": "ENSG00000139618"}'
+    assert expires_at > time.time()
+    assert reopened.get("missing") is None
+
+
+def test_disk_cache_compaction_enforces_size_cap(tmp_path):
+    disk = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=1000)
+    disk.put("expired", b"x" * 100, time.time() - 1)
+    for i in range(10):
+        disk.put(f"k{i}", b"y" * 200, time.time() + 60)
+    assert disk.bytes <= 1000
+    assert disk.get("expired") is None
+    assert disk.get("k9") is not None  # most recent survives
+
+
+def test_disk_cache_cap_holds_across_instances_sharing_a_file(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    workers = [DiskCache(path, max_bytes=10_000) for _ in range(8)]
+    for i in range(40):
+        for n, disk in enumerate(workers):
+            disk.put(f"w{n}-{i}", b"x" * 500, time.time() + 60)
+    total = workers[0]._conn.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+    assert total <= 10_000
+    assert sum(disk.compactions for disk in workers) > 0
+    # every instance sees the shared total, including after a replace
+    workers[1].put("w0-39", b"y" * 100, time.time() + 60)
+    total = workers[0]._conn.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+    assert all(disk.stats()["bytes"] == total for disk in workers)
+
+
+def test_codecs_roundtrip():
+    body = b'{"id": "ENSG00000139618"}' * 100
+    for name in ("zlib", "lzma"):
+        compress, decompress = get_codec(name)
+        packed = compress(body)
+        assert len(packed) < len(body)
+        assert decompress(packed) == body
+    with pytest.raises(ValueError):
+        get_codec("snappy")
+
+
+def test_tinylfu_keeps_hot_entries_during_a_scan():
+    cache = LRUCache(max_entries=10, max_bytes=0, admission=TinyLFU(capacity=10))
+    hot = list(range(10))  # int keys hash deterministically
+    for _ in range(5):
+        for key in hot:
+            if cache.get(key) is None:
+                cache.put(key, key)
+    for i in range(100):  # one-off batch lookups
+        key = 1000 + i
+        if cache.get(key) is None:
+            cache.put(key, key)
+    assert all(key in cache for key in hot)
+    assert cache.rejections == 100
+
+
+def test_snapshot_records_decode_across_chunk_boundaries():
+    stream = SNAPSHOT_MAGIC + b"".join(
+        pack_snapshot_record({"path": f"/lookup/id/ENSG{i}"}, b'{"id": %d}' % i, 123.0) for i in range(3)
+    )
+
+    async def one_byte_chunks():
+        for i in range(len(stream)):
+            yield stream[i:i + 1]
+
+    async def collect():
+        return [record async for record in read_snapshot(one_byte_chunks())]
+
+    records = asyncio.run(collect())
+    assert [meta["path"] for meta, _, _ in records] == ["/lookup/id/ENSG0", "/lookup/id/ENSG1", "/lookup/id/ENSG2"]
+    assert records[2][1:] == (b'{"id": 2}', 123.0)
+
+
+def test_expire_reclaims_only_entries_past_their_deadline():
+    cache = LRUCache(max_entries=0, max_bytes=0)
+    cache.put("old", 1, size=10, deadline=5.0)
+    cache.put("new", 2, size=10, deadline=50.0)
+    cache.put("forever", 3, size=10)
+    cache.put("renewed", 4, size=10, deadline=5.0)
+    cache.put("renewed", 4, size=10, deadline=60.0)  # stale heap item must be ignored
+    assert cache.expire(now=10.0) == 1
+    assert "old" not in cache and {"new", "forever", "renewed"} <= set(k for k, _ in cache.items())
+    assert cache.bytes == 30
+    assert cache.expire(now=1000.0) == 2
+    assert list(k for k, _ in cache.items()) == ["forever"]
+
+
+def test_micro_batcher_flushes_on_window_and_size():
+    calls = []
+
+    async def fn(group, items):
+        calls.append((group, items))
+        return {item: item * 10 for item in items if item != 3}
+
+    async def run():
+        batcher = MicroBatcher(fn, window=0.01, max_size=4)
+        windowed = await asyncio.gather(*(batcher.submit("a", i) for i in (1, 3, 1)))
+        sized = await asyncio.gather(*(batcher.submit("b", i) for i in range(4)))
+        return windowed, sized, batcher.stats()
+
+    windowed, sized, stats = asyncio.run(run())
+    assert windowed == [10, None, 10]
+    assert sized == [0, 10, 20, None]
+    assert calls == [("a", [1, 3]), ("b", [0, 1, 2, 3])]
+    assert stats["batches"] == 2 and stats["items"] == 7
+
+
+def test_micro_batcher_fails_every_waiter_with_the_batch_error():
+    async def fn(group, items):
+        raise RuntimeError("upstream down")
+
+    async def run():
+        batcher = MicroBatcher(fn, window=0.001, max_size=10)
+        return await asyncio.gather(batcher.submit(None, 1), batcher.submit(None, 2), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,162 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from app.limits import ConcurrencyLimiter, RateLimiter, RateLimitExceeded, retry_after_seconds
+
+
+def test_rate_limiter_paces_after_burst():
+    async def run():
+        limiter = RateLimiter(rate=100.0, burst=2)
+        started = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        return limiter, time.monotonic() - started
+
+    limiter, elapsed = asyncio.run(run())
+    # two tokens up front, then three more at 100/s
+    assert elapsed >= 0.025
+    assert limiter.acquired == 5 and limiter.throttled == 3
+
+
+def test_rate_limiter_learns_budget_from_headers():
+    limiter = RateLimiter(rate=15.0)
+    limiter.observe(200, {"X-RateLimit-Limit": "55000", "X-RateLimit-Remaining": "100", "X-RateLimit-Reset": "50"})
+    stats = limiter.stats()
+    assert stats["rate"] == 2.0 and stats["limit"] == 55000 and stats["remaining"] == 100
+    limiter.observe(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "30"})
+    assert limiter.stats()["blocked_for"] > 29
+
+
+def test_rate_limiter_blocks_on_429():
+    limiter = RateLimiter(rate=0.0)
+    limiter.observe(429, {"Retry-After": "0.05"})
+    assert 0 < limiter.stats()["blocked_for"] <= 0.05
+
+    async def run():
+        started = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.04
+    # without Retry-After the block doubles per consecutive 429
+    limiter = RateLimiter(rate=0.0, backoff=1.0)
+    limiter.observe(429, {})
+    limiter.observe(429, {})
+    assert 1.9 < limiter.stats()["blocked_for"] <= 2.0
+    assert limiter.rate_limited == 2
+
+
+def test_rate_limiter_rejects_waits_beyond_max_wait():
+    limiter = RateLimiter(rate=0.0, max_wait=1.0)
+    limiter.observe(429, {"Retry-After": "3600"})
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(RateLimitExceeded) as info:
+            await limiter.acquire()
+        return info.value, time.monotonic() - started
+
+    exc, elapsed = asyncio.run(run())
+    assert elapsed < 0.1 and 3599 < exc.retry_after <= 3600
+    assert limiter.rejected == 1 and limiter.acquired == 0
+
+
+def test_rate_limiter_takes_its_share_of_the_learned_budget():
+    limiter = RateLimiter(rate=15.0 / 4, share=0.25)
+    limiter.observe(200, {"X-RateLimit-Remaining": "100", "X-RateLimit-Reset": "50"})
+    assert limiter.stats()["rate"] == 0.5
+
+
+def test_retry_after_accepts_http_dates():
+    assert retry_after_seconds({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, now=1445412470.0) == 10.0
+    assert retry_after_seconds({"Retry-After": "soon"}) is None
+
+
+def test_concurrency_limit_grows_on_fast_calls_and_halves_on_errors():
+    async def run():
+        # latency is not under test here; only errors count as congestion
+        limiter = ConcurrencyLimiter(initial=4, min_limit=1, max_limit=8, tolerance=float("inf"))
+        for _ in range(20):
+            limiter.release(await limiter.acquire(), ok=True)
+        grown = limiter.limit
+        # concurrent failures from one round cut the limit only once
+        started = [await limiter.acquire() for _ in range(3)]
+        for start in started:
+            limiter.release(start, ok=False)
+        return grown, limiter
+
+    grown, limiter = asyncio.run(run())
+    assert 7 < grown < 8  # about +1 per limit-sized round of calls
+    assert limiter.limit == grown / 2 and limiter.decreases == 1
+
+
+def _release_after(limiter, latency, kind=None):
+    limiter.in_flight += 1
+    limiter.release(time.monotonic() - latency, kind=kind)
+
+
+def test_concurrency_limit_treats_slow_calls_as_congestion():
+    limiter = ConcurrencyLimiter(initial=10, tolerance=2.0)
+    for _ in range(200):
+        _release_after(limiter, 0.01)
+    # one slow call is not congestion, a run of them is
+    _release_after(limiter, 0.05)
+    assert limiter.decreases == 0
+    grown = limiter.limit
+    for _ in range(5):
+        _release_after(limiter, 0.05)
+    assert limiter.decreases == 1 and limiter.limit < grown / 2 + 0.5
+
+
+def test_concurrency_limit_keeps_a_baseline_per_kind_of_call():
+    limiter = ConcurrencyLimiter(initial=10, max_limit=100, tolerance=2.0)
+    for i in range(100):
+        # one call in ten is a batch POST that is always 20x slower than a lookup
+        if i % 10 == 9:
+            _release_after(limiter, 0.2, kind="POST /lookup/id")
+        else:
+            _release_after(limiter, 0.01, kind="GET /lookup/id")
+    assert limiter.decreases == 0 and limiter.limit > 10
+    # slow lookups are still congestion
+    for _ in range(10):
+        _release_after(limiter, 0.1, kind="GET /lookup/id")
+    assert limiter.decreases == 1
+
+
+def test_concurrency_limit_ignores_jitter_of_an_unloaded_server():
+    rng = random.Random(7)
+    limiter = ConcurrencyLimiter(initial=20, min_limit=2, max_limit=100, tolerance=2.0)
+    for _ in range(2000):
+        # the limiter cuts at most once per round; let every call count here
+        limiter._last_decrease = float("-inf")
+        _release_after(limiter, rng.lognormvariate(0, 0.4) * 0.2, kind="GET /lookup/id")
+    assert limiter.decreases == 0 and limiter.limit > 60  # +1/limit for every call from 20
+
+
+def test_excess_callers_queue_in_order_and_time_out():
+    order = []
+
+    async def call(limiter, name, hold):
+        started = await limiter.acquire()
+        order.append(name)
+        await asyncio.sleep(hold)
+        limiter.release(started)
+
+    async def run():
+        limiter = ConcurrencyLimiter(initial=1, min_limit=1, max_limit=1, max_wait=0.2)
+        await asyncio.gather(call(limiter, "a", 0.02), call(limiter, "b", 0.02), call(limiter, "c", 0))
+        slow = ConcurrencyLimiter(initial=1, min_limit=1, max_limit=1, max_wait=0.01)
+        holder = asyncio.ensure_future(call(slow, "hold", 0.1))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await slow.acquire()
+        await holder
+        return limiter, slow
+
+    limiter, slow = asyncio.run(run())
+    assert order == ["a", "b", "c", "hold"]
+    assert limiter.queued == 2 and limiter.in_flight == 0
+    assert slow.rejected == 1 and slow.in_flight == 0